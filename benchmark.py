@@ -0,0 +1,310 @@
+"""
+benchmark.py
+Timing suite for the app's hot paths on synthetic datasets.
+
+A generator writes CSVs with the school_data.csv columns at any size, with
+the same kind of messy free text as the real data ("3.9 (listed under ...)",
+"~1,000+ students", "€5,380–€5,925/year (2025/26)", "FREE (public)",
+approximate coordinates, etc.). For each size the suite times:
+
+- load_schools: CSV parse + typing, the Parquet sidecar path, the
+  memory-mapped Arrow snapshot, full records and the map's records
+- create_map / serialize_map in each rendering mode, and the size of the
+  payload sent to the browser (raw and gzipped, per school), e.g. the single
+  GeoJSON layer against per-marker output; the viewport payload includes the
+  marker layer of the first render, the schools in the initial view
+- build_table (vectorized build and sort)
+- composite ranking: scoring, top-k by partial sort against a full sort
+- click resolution: KD-tree build and nearest-pin queries
+- the schools_data.py lookup helpers (index build and lookups)
+
+Results are written as JSON; pass --compare with an earlier results file to
+print the ratio of each median and payload size against it.
+
+Usage:
+    python benchmark.py [--sizes 10,1000,10000,100000] [--repeat 3]
+                        [--output benchmark_results.json] [--compare old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import schools_data
+from dataset import frame_to_records, load_frame, parse_csv, read_arrow_snapshot, write_arrow_snapshot
+from map_builder import MAP_MODES, create_map, map_records, marker_layer, visible_schools
+from map_component import feature_group_script, serialize_map
+from ranking import Ranking
+from spatial_index import SpatialIndex
+from table_builder import build_table
+
+DEFAULT_SIZES = [10, 1_000, 10_000, 100_000]
+OUTPUT_FILE = "benchmark_results.json"
+
+# Serializing individual folium markers takes over a minute at 10k; larger sizes skip the mode
+MAX_MARKER_SCHOOLS = 1_000
+LOOKUPS = 1_000
+TOP_K = 200  # default table size in the app
+
+MUNICIPALITIES = ["València", "Paterna", "Godella", "Torrent", "Burjassot", "Mislata",
+                  "Puçol", "Rocafort", "Bétera", "Alboraya", "Manises", "Quart de Poblet"]
+TYPES = ["Public", "Private", "Concertado", "Private (non-profit)",
+         "Public — owned by Diputació de València", "Private / Concertado (Primary–ESO)"]
+CURRICULA = ["Spanish national curriculum (LOMLOE)", "British National Curriculum + IGCSE, A-Levels",
+             "American curriculum (Common Core); IB Diploma", "German Abitur (Deutsche Schule)",
+             "Montessori pedagogy (AMI-inspired); recognised by the Spanish Ministry of Education"]
+LANGUAGES = ["English", "Spanish", "Valencian", "German", "French", "Spanish Sign Language"]
+PEDAGOGY = ["project-based learning", "Montessori method", "mixed-age classrooms",
+            "cooperative learning", "inquiry-led", "traditional", "outdoor education",
+            "'Hacer es comprender' ('Doing is Understanding')", "robotics programme"]
+DEVICE = ["Screen-light early years; tablets from Year 5",
+          "1:1 iPads from ESO. No formal device policy published — contact school for details.",
+          "Chromebooks in class; phones banned (Conselleria rules)", ""]
+
+
+def _messy_rating(rng) -> str:
+    r = rng.uniform(2.5, 5.0)
+    return rng.choice([
+        f"{r:.1f}", f"{r:.1f}", f"{r:.1f}/5", f"{r:.1f} (listed under another campus)",
+        f"~{r:.1f}", "N/A", "",
+    ])
+
+
+def _messy_count(rng) -> str:
+    n = int(rng.integers(5, 400))
+    return rng.choice([f"{n}", f"{n}+", f"~{n}", f"approx. {n} reviews", "", "Not listed"])
+
+
+def _messy_students(rng) -> str:
+    n = int(rng.integers(50, 2500))
+    return rng.choice([
+        f"{n:,}", f"~{n:,}+ students", f"{n}–{n + 100} students (estimated)",
+        f"{n}+ (across both campuses combined)", "Not officially published — contact school",
+    ])
+
+
+def _messy_fees(rng, school_type: str) -> str:
+    if "Public" in school_type:
+        return rng.choice(["FREE (public)", "FREE — AFA (parents' association) ~€30/year", ""])
+    m = int(rng.integers(250, 1100))
+    return rng.choice([
+        f"€{m}/month (full day); Admission fee: €2,100 first year. 10 instalments/year.",
+        f"€{m * 10:,}–€{m * 12:,}/year (2025/26). Lunch billed separately.",
+        f"~€{m}/month", "Not publicly disclosed; contact school for details",
+    ])
+
+
+def synthetic_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Raw text frame with the school_data.csv columns and n rows."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        school_type = str(rng.choice(TYPES))
+        municipality = str(rng.choice(MUNICIPALITIES))
+        lo = int(rng.choice([0, 1, 2, 3, 6, 12]))
+        hi = int(rng.choice([6, 12, 16, 18]))
+        langs = rng.choice(LANGUAGES, size=int(rng.integers(1, 4)), replace=False)
+        rows.append({
+            "id": f"school_{i:06d}",
+            "name": f"Colegio {rng.choice(['San', 'Santa', 'El', 'La'])} {i} ({municipality})",
+            "type": school_type,
+            "address": f"Calle {int(rng.integers(1, 300))}, 46{int(rng.integers(0, 999)):03d} {municipality}, Valencia, Spain",
+            "municipality": municipality,
+            "neighborhood": rng.choice(["", "Centro", "Benimaclet", "Campanar", "Ruzafa"]),
+            "founded": rng.choice([str(int(rng.integers(1900, 2024))), "1909 (originally founded)", ""]),
+            "ages": rng.choice([f"{lo} to {hi} years", "20 months to 6 years", f"{lo}–{hi}"]),
+            "stages": "Infantil; Primaria; ESO" + ("; Bachillerato" if hi == 18 else ""),
+            "curriculum": rng.choice(CURRICULA),
+            "languages_day_to_day": ", ".join(langs) + rng.choice(["", " (vehicular)", "; English from age 3"]),
+            "languages_taught": ", ".join(LANGUAGES[:int(rng.integers(2, 5))]),
+            "device_policy_summary": rng.choice(DEVICE),
+            "pedagogy": "; ".join(rng.choice(PEDAGOGY, size=3, replace=False)),
+            # A few rows without coordinates, as in the real data
+            "lat": "" if rng.random() < 0.01 else f"{39.47 + rng.normal(0, 0.08):.4f}",
+            "lon": "" if rng.random() < 0.01 else f"{-0.38 + rng.normal(0, 0.08):.4f}",
+            "coords_confidence": rng.choice(["verified_wikidata", "approximate_neighborhood (check)", ""]),
+            "micole_rating": _messy_rating(rng),
+            "micole_reviews": _messy_count(rng),
+            "google_rating": _messy_rating(rng),
+            "google_reviews": _messy_count(rng),
+            "fees_range": _messy_fees(rng, school_type),
+            "student_count": _messy_students(rng),
+            "special_notes": rng.choice(["", "School bus available (€175/month). VERIFY EXACT LOCATION.",
+                                         "Two campuses; see website."]),
+        })
+    return pd.DataFrame(rows)
+
+
+def timed(fn, repeat: int) -> tuple[dict, object]:
+    """Run fn `repeat` times; returns (timing stats in seconds, last result)."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "runs": len(times)}, result
+
+
+def payload_size(payload: dict, n: int) -> dict:
+    """Bytes of the component payload as sent to the browser, raw and gzipped."""
+    raw = json.dumps(payload).encode()
+    return {
+        "bytes": len(raw),
+        "gzip_bytes": len(gzip.compress(raw, 6)),
+        "bytes_per_school": round(len(raw) / max(n, 1), 1),
+    }
+
+
+def describe(stats: dict) -> str:
+    if "median" in stats:
+        return f"{stats['median'] * 1000:10.2f} ms"
+    if "bytes" in stats:
+        return f"{stats['bytes']:10,d} B  (gzip {stats['gzip_bytes']:,d} B, {stats['bytes_per_school']} B/school)"
+    return stats["skipped"]
+
+
+def bench_size(n: int, repeat: int, workdir: str) -> dict:
+    path = os.path.join(workdir, f"schools_{n}.csv")
+    synthetic_frame(n).to_csv(path, index=False)
+    results = {}
+
+    results["load_schools.parse_csv"], df = timed(lambda: parse_csv(path), repeat)
+    load_frame(path)  # writes the sidecar
+    results["load_schools.sidecar"], _ = timed(lambda: load_frame(path), repeat)
+    arrow = os.path.join(workdir, f"schools_{n}.arrow")
+    write_arrow_snapshot(pa.Table.from_pandas(df, preserve_index=False), arrow)
+    results["load_schools.arrow_mmap"], _ = timed(lambda: read_arrow_snapshot(arrow), repeat)
+    results["load_schools.records"], records = timed(lambda: frame_to_records(df), repeat)
+    results["load_schools.map_records"], schools = timed(lambda: map_records(df), repeat)
+
+    for mode in MAP_MODES:
+        if mode == "markers" and n > MAX_MARKER_SCHOOLS:
+            results[f"create_map.{mode}"] = {"skipped": f"more than {MAX_MARKER_SCHOOLS} schools"}
+            results[f"serialize_map.{mode}"] = {"skipped": f"more than {MAX_MARKER_SCHOOLS} schools"}
+            continue
+        results[f"create_map.{mode}"], _ = timed(lambda: create_map(schools, mode=mode), repeat)
+        # serialize_map renders the map, so each run needs a fresh one
+        maps = [create_map(schools, mode=mode) for _ in range(repeat)]
+        results[f"serialize_map.{mode}"], payload = timed(lambda: serialize_map(maps.pop()), repeat)
+        if mode == "viewport":
+            # The base map is only part of it: until the map reports its bounds,
+            # the dynamic layer carries one folium marker per school in the
+            # initial view (nearly all of the synthetic ones, which cluster
+            # around Valencia)
+            visible = visible_schools(SpatialIndex.from_frame(df), df, None)
+            if len(visible) > MAX_MARKER_SCHOOLS:
+                results[f"payload.{mode}"] = {"skipped": f"more than {MAX_MARKER_SCHOOLS} schools"}
+                continue
+            results["serialize_map.viewport_layer"], layer = timed(
+                lambda: feature_group_script(marker_layer(visible)), repeat)
+            payload = {**payload, "feature_group": layer}
+        results[f"payload.{mode}"] = payload_size(payload, n)
+
+    results["build_table"], _ = timed(lambda: build_table(df), repeat)
+
+    results["rank.scores"], ranking = timed(lambda: Ranking(df), repeat)
+    results[f"rank.top_{TOP_K}"], top = timed(lambda: ranking.top_k(k=TOP_K), repeat)
+    results["rank.full_sort"], _ = timed(lambda: ranking.top_k(), repeat)
+    results[f"build_table.top_{TOP_K}"], _ = timed(
+        lambda: build_table(df.iloc[top], score=ranking.scores[top]), repeat)
+
+    rng = np.random.default_rng(1)
+    located = [s for s in schools if s["lat"] is not None and s["lon"] is not None]
+    clicks = [located[i] for i in rng.integers(0, len(located), LOOKUPS)]
+    results["click.build_index"], index = timed(lambda: SpatialIndex.from_frame(df), repeat)
+    results[f"click.nearest_x{LOOKUPS}"], _ = timed(
+        lambda: [index.nearest(s["lat"], s["lon"], k=4) for s in clicks], repeat)
+
+    original = schools_data.SCHOOLS
+    try:
+        schools_data.SCHOOLS = records
+        ids = [records[i]["id"] for i in rng.integers(0, n, LOOKUPS)]
+
+        def build():
+            schools_data.invalidate_indexes()
+            schools_data.get_school_by_id(ids[0])
+
+        results["lookup.build_indexes"], _ = timed(build, repeat)
+        results[f"lookup.by_id_x{LOOKUPS}"], _ = timed(
+            lambda: [schools_data.get_school_by_id(i) for i in ids], repeat)
+        results["lookup.by_municipality"], _ = timed(
+            lambda: schools_data.get_schools_by_municipality("València"), repeat)
+        results["lookup.by_type"], _ = timed(
+            lambda: schools_data.get_schools_by_type("public"), repeat)
+        results["lookup.by_type_substring"], _ = timed(
+            lambda: schools_data.get_schools_by_type("concert"), repeat)
+    finally:
+        schools_data.SCHOOLS = original
+        schools_data.invalidate_indexes()
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Print current/baseline ratios of every median time and payload size in both files."""
+    for size, timings in results["results"].items():
+        old = baseline.get("results", {}).get(size, {})
+        for name, stats in timings.items():
+            metric = "median" if "median" in stats else "bytes"
+            if metric in stats and metric in old.get(name, {}):
+                ratio = stats[metric] / old[name][metric] if old[name][metric] else float("inf")
+                flag = "  <-- slower" if ratio > 1.2 else ""
+                print(f"  n={size:>7} {name:<32} {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the app's hot paths on synthetic datasets.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated school counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            print(f"n={n}")
+            results["results"][str(n)] = bench_size(n, args.repeat, workdir)
+            for name, stats in results["results"][str(n)].items():
+                print(f"  {name:<32} {describe(stats)}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Median ratios against {args.compare} ({baseline.get('commit')}):")
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+comparison.py
+Side-by-side comparison of several schools as aligned columns.
+
+The selected schools are taken from the typed dataset frame with one
+positional selection (an id -> row Index built once per dataset version,
+then df.iloc) and every comparison row is formatted as a column operation
+over that small frame, instead of looking up and formatting each school's
+record field by field.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from proximity import haversine_km
+from ranking import RATING_SOURCES
+
+MAX_COMPARE = 6
+
+# (row label, dataset column) shown as text, in order after the numeric rows
+TEXT_ROWS = [
+    ("Type", "type"),
+    ("Municipality", "municipality"),
+    ("Ages", "ages"),
+    ("Languages (day-to-day)", "languages_day_to_day"),
+    ("Languages taught", "languages_taught"),
+    ("Curriculum", "curriculum"),
+    ("Device policy", "device_policy_summary"),
+    ("Fees (as listed)", "fees_range"),
+]
+
+# Numeric dataset columns read besides the rating sources (see ranking.py)
+NUMERIC_COLUMNS = ["fee_monthly_eur", "fee_annual_eur", "student_count_value"]
+
+COMPARE_COLUMNS = (
+    [c for cols in RATING_SOURCES.values() for c in cols]
+    + NUMERIC_COLUMNS
+    + [column for _, column in TEXT_ROWS]
+)
+
+MISSING = "—"
+
+
+def id_index(df: pd.DataFrame) -> pd.Index:
+    """School id -> row position lookup for the frame."""
+    return pd.Index(df["id"].astype("string"))
+
+
+def row_positions(index: pd.Index, ids) -> np.ndarray:
+    """Row positions of the given ids, in order, skipping ids not in the frame."""
+    positions = index.get_indexer(list(ids))
+    return positions[positions >= 0]
+
+
+def _column(rows: pd.DataFrame, column: str) -> pd.Series:
+    if column not in rows:
+        return pd.Series(MISSING, index=rows.index, dtype="string")
+    values = rows[column].astype("string")
+    return values.mask(values.isna() | values.str.strip().eq(""), MISSING)
+
+
+def _numeric(rows: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in rows:
+        return np.full(len(rows), np.nan)
+    return rows[column].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _number(values: np.ndarray, fmt: str) -> pd.Series:
+    values = pd.Series(values, dtype="float64")
+    return values.map(fmt.format, na_action="ignore").fillna(MISSING).astype("string")
+
+
+def _rating(rows: pd.DataFrame, source: str) -> pd.Series:
+    rating_col, count_col = RATING_SOURCES[source]
+    rating = _number(_numeric(rows, rating_col), "{:.1f}⭐")
+    reviews = _number(_numeric(rows, count_col), " ({:,.0f} reviews)")
+    return rating + reviews.where(rating.ne(MISSING) & reviews.ne(MISSING), "")
+
+
+def comparison_table(df: pd.DataFrame, positions: np.ndarray, scores: np.ndarray | None = None,
+                     home: tuple[float, float] | None = None) -> pd.DataFrame:
+    """One column per selected school, one row per compared field."""
+    rows = df.iloc[positions].reset_index(drop=True)
+    out = {}
+    if scores is not None:
+        out["🏆 Score"] = _number(np.asarray(scores)[positions], "{:.2f}")
+    out["⭐ Micole"] = _rating(rows, "micole")
+    out["⭐ Google"] = _rating(rows, "google")
+    if home is not None:
+        distance = haversine_km(home[0], home[1], _numeric(rows, "lat"), _numeric(rows, "lon"))
+        out["🏠 Distance"] = _number(distance, "{:.1f} km")
+    out["💰 Monthly fee"] = _number(_numeric(rows, "fee_monthly_eur"), "€{:,.0f}")
+    out["💰 Annual fee"] = _number(_numeric(rows, "fee_annual_eur"), "€{:,.0f}")
+    out["👥 Students"] = _number(_numeric(rows, "student_count_value"), "{:,.0f}")
+    for label, column in TEXT_ROWS:
+        out[label] = _column(rows, column)
+
+    table = pd.DataFrame({label: values.to_numpy(dtype=object) for label, values in out.items()})
+    names = _column(rows, "name")
+    # Columns need unique headers; repeated names get their id
+    repeated = names.duplicated(keep=False)
+    table.index = names.mask(repeated, names + " (" + rows["id"].astype("string") + ")").tolist()
+    return table.T
@@ -0,0 +1,177 @@
+"""
+compile_data.py
+Compile schools_data.py and school_data.csv into one versioned snapshot.
+
+The two sources have drifted apart: schools_data.py holds nested records
+(reviews, fees, sources, list-valued languages_taught) while school_data.csv
+is flat and more recently curated. This flattens the nested records into the
+CSV schema, merges both by id and writes schools_snapshot.parquet plus the
+same table as an Arrow IPC file, schools_snapshot.arrow, which app processes
+memory-map and share (see dataset.load_dataset).
+
+Merge rules:
+- CSV values win whenever they are non-empty; schools_data.py fills the gaps
+- schools present in only one source are kept
+- list fields that have no CSV column (special_features, facilities,
+  accreditations) and the free-text notes are carried as extra columns
+
+Usage:
+    python compile_data.py [--output schools_snapshot.parquet]
+                           [--arrow-output schools_snapshot.arrow]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import schools_data
+from dataset import (
+    ARROW_SNAPSHOT_FILE,
+    DATA_FILE,
+    SCHEMA_VERSION,
+    SCHEMA_VERSION_KEY,
+    SNAPSHOT_FILE,
+    SNAPSHOT_SOURCES_KEY,
+    SNAPSHOT_VERSION_KEY,
+    SOURCE_MODULE,
+    apply_schema,
+    dataset_version,
+    write_arrow_snapshot,
+)
+
+REVIEW_FIELDS = ["micole_rating", "micole_reviews", "google_rating", "google_reviews"]
+EXTRA_LIST_FIELDS = ["special_features", "facilities", "accreditations"]
+EXTRA_TEXT_FIELDS = ["coords_note", "notes"]
+
+
+def _text(value) -> str | None:
+    """Render a scalar or list as the CSV would store it."""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value) or None
+    text = str(value).strip()
+    return text or None
+
+
+def flatten_school(school: dict) -> dict:
+    """Flatten one nested schools_data.py record into the CSV schema."""
+    row = {
+        key: _text(value)
+        for key, value in school.items()
+        if not isinstance(value, dict) and key not in EXTRA_LIST_FIELDS and key != "sources"
+    }
+    reviews = school.get("reviews") or {}
+    for field in REVIEW_FIELDS:
+        row[field] = _text(reviews.get(field))
+
+    fees = school.get("fees") or {}
+    fee_parts = [_text(fees.get(k)) for k in ("range", "tuition", "notes")]
+    row["fees_range"] = "; ".join(p for p in fee_parts if p) or None
+
+    for field in EXTRA_LIST_FIELDS:
+        items = school.get(field) or []
+        row[field] = "; ".join(str(i) for i in items) or None
+    return row
+
+
+def _same(a: str, b: str) -> bool:
+    try:
+        return abs(float(a) - float(b)) < 1e-9
+    except ValueError:
+        return " ".join(a.split()) == " ".join(b.split())
+
+
+def merge_sources(csv_df: pd.DataFrame, nested: list[dict]) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Merge the raw CSV frame with flattened nested records by id.
+
+    Returns the merged raw-text frame and a per-column count of conflicting
+    values (both sources non-empty and different; the CSV value is kept).
+    """
+    flat = pd.DataFrame([flatten_school(s) for s in nested]).set_index("id")
+    csv_df = csv_df.set_index("id")
+
+    columns = list(csv_df.columns)
+    columns += [c for c in EXTRA_LIST_FIELDS + EXTRA_TEXT_FIELDS if c in flat.columns and c not in columns]
+    ids = list(csv_df.index) + [i for i in flat.index if i not in csv_df.index]
+    left = csv_df.reindex(index=ids, columns=columns)
+    right = flat.reindex(index=ids, columns=columns)
+
+    conflicts = {}
+    for col in columns:
+        both = left[col].notna() & right[col].notna()
+        differing = sum(not _same(a, b) for a, b in zip(left.loc[both, col], right.loc[both, col]))
+        if differing:
+            conflicts[col] = differing
+
+    merged = left.where(left.notna(), right)
+    return merged.reset_index(names="id"), conflicts
+
+
+def frame_version(df: pd.DataFrame) -> str:
+    """Content hash of a compiled frame, used as the snapshot version."""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(hashed.tobytes())
+    digest.update(",".join(df.columns).encode())
+    return digest.hexdigest()[:16]
+
+
+def compile_snapshot(output: str = SNAPSHOT_FILE, arrow_output: str | None = ARROW_SNAPSHOT_FILE
+                     ) -> tuple[str, pd.DataFrame, dict[str, int]]:
+    """Build and write the snapshot (Parquet, and Arrow IPC unless arrow_output
+    is None); returns (version, frame, conflicts)."""
+    csv_df = pd.read_csv(DATA_FILE, dtype=str)
+    csv_df = csv_df.loc[:, ~csv_df.columns.str.contains('^Unnamed')]
+    # Re-read the module: a long-running app recompiles after it was edited
+    merged, conflicts = merge_sources(csv_df, importlib.reload(schools_data).SCHOOLS)
+    df = apply_schema(merged)
+    version = frame_version(df)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sources = {DATA_FILE: dataset_version(DATA_FILE), SOURCE_MODULE: dataset_version(SOURCE_MODULE)}
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SCHEMA_VERSION_KEY: str(SCHEMA_VERSION).encode(),
+        SNAPSHOT_VERSION_KEY: version.encode(),
+        SNAPSHOT_SOURCES_KEY: json.dumps(sources).encode(),
+    })
+    # Written aside and renamed, as running app processes may be reading it
+    tmp = f"{output}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, output)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if arrow_output:
+        write_arrow_snapshot(table, arrow_output)
+    return version, df, conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--output", default=SNAPSHOT_FILE)
+    parser.add_argument("--arrow-output", default=ARROW_SNAPSHOT_FILE,
+                        help="memory-mappable Arrow IPC copy; empty to skip")
+    args = parser.parse_args()
+
+    version, df, conflicts = compile_snapshot(args.output, args.arrow_output or None)
+    print(f"Wrote {args.output}: {len(df)} schools, {len(df.columns)} columns, version {version}")
+    if args.arrow_output:
+        print(f"Wrote {args.arrow_output} (memory-mapped by the app)")
+    if conflicts:
+        print("Conflicting values (CSV kept):")
+        for col, count in sorted(conflicts.items(), key=lambda kv: -kv[1]):
+            print(f"  {col}: {count}")
+
+
+if __name__ == "__main__":
+    main()
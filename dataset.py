@@ -0,0 +1,284 @@
+"""
+dataset.py
+Typed columnar loading of the schools dataset.
+
+The app prefers the compiled snapshot produced by compile_data.py (one file
+merging school_data.csv and schools_data.py). When either source is edited
+after compiling, the snapshot is recompiled on the next version check, so the
+merged-only columns (special_features, facilities, notes, ...) never silently
+disappear; only when that fails (or no snapshot was ever compiled) is
+school_data.csv loaded on its own, with a warning in the former case.
+
+The snapshot is written twice: as Parquet and as an uncompressed Arrow IPC
+file (schools_snapshot.arrow). The Arrow file is memory-mapped read-only,
+so several server processes on one host share its pages through the OS page
+cache. Their string columns stay Arrow-backed views of those pages, and a
+worker's cold start is an mmap rather than a parse or decompression.
+
+The CSV is parsed once into a DataFrame with explicit dtypes (categorical
+type/municipality, float coordinates, nullable integer founding year, strings
+for everything else) using vectorized coercion. The result is written to a
+Parquet sidecar next to the CSV, tagged with the CSV's mtime and SHA-256, so
+later cold starts read the sidecar and skip CSV parsing entirely.
+
+lat/lon stay float64: float32 only resolves ~0.5 m at this latitude, which is
+too coarse to keep neighbouring campuses apart.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from parsing import add_parsed_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # sidecar cache is optional
+    pa = ipc = pq = None
+
+DATA_FILE = "school_data.csv"
+SOURCE_MODULE = "schools_data.py"
+SNAPSHOT_FILE = "schools_snapshot.parquet"
+ARROW_SNAPSHOT_FILE = "schools_snapshot.arrow"
+
+CATEGORY_COLUMNS = ["type", "municipality"]
+FLOAT_COLUMNS = ["lat", "lon"]
+INT_COLUMNS = {"founded": "Int16"}
+
+# Bump whenever apply_schema output changes so stale caches are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA_VERSION_KEY = b"schoolmap.schema_version"
+SIDECAR_MTIME_KEY = b"schoolmap.source_mtime_ns"
+SIDECAR_HASH_KEY = b"schoolmap.source_sha256"
+SNAPSHOT_VERSION_KEY = b"schoolmap.snapshot_version"
+SNAPSHOT_SOURCES_KEY = b"schoolmap.source_versions"
+
+
+def dataset_version(path: str = DATA_FILE) -> str:
+    """Cheap version stamp for a data file; changes whenever it is rewritten."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_csv(path: str = DATA_FILE) -> pd.DataFrame:
+    """Parse the CSV into typed columns."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=True)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]  # Remove unnamed columns
+    return apply_schema(df)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a frame of raw text columns to the dataset dtypes."""
+    df = df.copy()
+    for col in FLOAT_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    for col, dtype in INT_COLUMNS.items():
+        if col in df:
+            # Prose such as "1909 (originally founded)" does not coerce and becomes <NA>
+            values = pd.to_numeric(df[col], errors="coerce")
+            values = values.where(values == values.round())
+            df[col] = values.astype(dtype)
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
+    return add_parsed_columns(df)
+
+
+def _read_sidecar(path: str, mtime_ns: int) -> pd.DataFrame | None:
+    """Return the cached frame if the sidecar matches the CSV, else None."""
+    parquet = sidecar_path(path)
+    if pq is None or not os.path.exists(parquet):
+        return None
+    try:
+        meta = pq.read_schema(parquet).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if meta.get(SCHEMA_VERSION_KEY) != str(SCHEMA_VERSION).encode():
+        return None
+    if meta.get(SIDECAR_MTIME_KEY) != str(mtime_ns).encode():
+        # Touched but possibly unchanged: fall back to comparing content hashes
+        if meta.get(SIDECAR_HASH_KEY) != file_sha256(path).encode():
+            return None
+    try:
+        return pd.read_parquet(parquet)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def _write_sidecar(df: pd.DataFrame, path: str, mtime_ns: int) -> None:
+    if pq is None:
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        SCHEMA_VERSION_KEY: str(SCHEMA_VERSION).encode(),
+        SIDECAR_MTIME_KEY: str(mtime_ns).encode(),
+        SIDECAR_HASH_KEY: file_sha256(path).encode(),
+    })
+    parquet = sidecar_path(path)
+    tmp = f"{parquet}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, parquet)
+    except OSError:
+        # Read-only checkout: run without the cache
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_frame(path: str = DATA_FILE, use_sidecar: bool = True) -> pd.DataFrame:
+    """Load the typed school DataFrame, via the Parquet sidecar when it is fresh."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    if use_sidecar:
+        df = _read_sidecar(path, mtime_ns)
+        if df is not None:
+            return df
+    df = parse_csv(path)
+    if use_sidecar:
+        _write_sidecar(df, path, mtime_ns)
+    return df
+
+
+def frame_to_records(df: pd.DataFrame) -> list[dict]:
+    """Convert the typed frame to plain dicts, with None for missing values."""
+    obj = df.astype(object)
+    return obj.where(df.notna(), None).to_dict("records")
+
+
+def write_arrow_snapshot(table: "pa.Table", path: str = ARROW_SNAPSHOT_FILE) -> None:
+    """Write an uncompressed Arrow IPC file, replacing any previous one atomically.
+
+    Processes that still map the old file keep reading its (unlinked) pages
+    until they reload; the file is never rewritten in place.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _arrow_string_dtype(arrow_type):
+    # Arrow-backed str columns (pandas 3's default "str" dtype, spelled out so
+    # that strings never silently become object columns, copied per worker)
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    return None
+
+
+def read_arrow_snapshot(path: str = ARROW_SNAPSHOT_FILE) -> pd.DataFrame:
+    """Memory-map an Arrow IPC snapshot read-only and view it as a DataFrame.
+
+    String columns wrap the mapped buffers without copying; split_blocks
+    keeps pandas from consolidating (copying) the numeric columns into one
+    block.
+    """
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper=_arrow_string_dtype)
+
+
+def _snapshot_metadata(path: str) -> dict:
+    if path.endswith(".arrow"):
+        return ipc.open_file(pa.memory_map(path, "r")).schema.metadata or {}
+    return pq.read_schema(path).metadata or {}
+
+
+def snapshot_version(path: str = SNAPSHOT_FILE) -> str | None:
+    """Version of a compiled snapshot (Parquet or Arrow), or None if it is missing or stale."""
+    if pq is None or not os.path.exists(path):
+        return None
+    try:
+        meta = _snapshot_metadata(path)
+        if meta.get(SCHEMA_VERSION_KEY) != str(SCHEMA_VERSION).encode():
+            return None
+        sources = json.loads(meta[SNAPSHOT_SOURCES_KEY])
+        for source, version in sources.items():
+            if dataset_version(source) != version:
+                return None
+        return meta[SNAPSHOT_VERSION_KEY].decode()
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+_REBUILD_LOCK = threading.Lock()
+_FAILED_REBUILDS: set[str] = set()  # source versions a rebuild already failed for
+
+
+def rebuild_stale_snapshot() -> str | None:
+    """Recompile a snapshot whose sources changed since it was compiled.
+
+    Returns the new snapshot version, or None when there is no snapshot to
+    keep current or it cannot be rebuilt; a failure warns once per state of
+    the sources, which are then served from the CSV alone.
+    """
+    if pq is None or not (os.path.exists(SNAPSHOT_FILE) or os.path.exists(ARROW_SNAPSHOT_FILE)):
+        return None
+    with _REBUILD_LOCK:
+        version = snapshot_version(ARROW_SNAPSHOT_FILE) or snapshot_version()
+        if version is not None:  # rebuilt meanwhile by another thread or process
+            return version
+        sources = f"{dataset_version(DATA_FILE)}/{dataset_version(SOURCE_MODULE)}"
+        if sources in _FAILED_REBUILDS:
+            return None
+        from compile_data import compile_snapshot  # imports this module
+        try:
+            version, _, _ = compile_snapshot(
+                SNAPSHOT_FILE, ARROW_SNAPSHOT_FILE if os.path.exists(ARROW_SNAPSHOT_FILE) else None
+            )
+        except Exception as exc:  # e.g. a syntax error in schools_data.py, a read-only checkout
+            _FAILED_REBUILDS.add(sources)
+            warnings.warn(
+                f"{SNAPSHOT_FILE} is older than its sources and could not be recompiled "
+                f"({exc!r}); serving {DATA_FILE} alone, without the columns merged from "
+                f"{SOURCE_MODULE}. Run compile_data.py to fix.",
+                RuntimeWarning, stacklevel=2,
+            )
+            return None
+        return version
+
+
+def current_version() -> str:
+    """Version of whatever load_dataset() will return; recompiles a stale snapshot."""
+    return (
+        snapshot_version(ARROW_SNAPSHOT_FILE) or snapshot_version()
+        or rebuild_stale_snapshot()
+        or f"{dataset_version(DATA_FILE)}-s{SCHEMA_VERSION}"
+    )
+
+
+def load_dataset() -> pd.DataFrame:
+    """Load the compiled snapshot (memory-mapped Arrow first, then Parquet),
+    recompiling it if its sources changed, else the CSV alone."""
+    if snapshot_version(ARROW_SNAPSHOT_FILE) is None and snapshot_version() is None:
+        rebuild_stale_snapshot()
+    if snapshot_version(ARROW_SNAPSHOT_FILE) is not None:
+        return read_arrow_snapshot(ARROW_SNAPSHOT_FILE)
+    if snapshot_version() is not None:
+        return pd.read_parquet(SNAPSHOT_FILE)
+    return load_frame(DATA_FILE)
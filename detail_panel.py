@@ -0,0 +1,119 @@
+"""
+detail_panel.py
+The "School Information" panel rendered as one HTML fragment.
+
+The app caches the fragment per school id and dataset version, so selecting
+a school sends a single precomputed block instead of rebuilding the layout
+with one st.markdown call per field on every rerun. PANEL_CSS styles the
+fragment; the app and the static export (export_site.py) both include it.
+"""
+
+from __future__ import annotations
+
+PANEL_CSS = """
+.school-header {
+    color: #2c3e50;
+    font-size: 1.8rem;
+    font-weight: 600;
+    margin-bottom: 0.5rem;
+}
+.school-type {
+    color: #7f8c8d;
+    font-size: 1.1rem;
+    margin-bottom: 1rem;
+}
+.info-label {
+    color: #34495e;
+    font-weight: 600;
+    margin-top: 0.8rem;
+}
+.info-value {
+    color: #555;
+    margin-bottom: 0.5rem;
+}
+"""
+
+NOTES_STYLE = "background-color: #f0f2f6; padding: 12px; border-radius: 8px; margin: 12px 0; font-size: 0.95em; line-height: 1.5;"
+
+# (label, field) sections shown after location/founded/students, in order
+TEXT_SECTIONS = [
+    ("👶 Ages", "ages"),
+    ("🎓 Stages", "stages"),
+    ("📚 Curriculum", "curriculum"),
+    ("🌐 Languages (Day-to-Day)", "languages_day_to_day"),
+    ("🗣️ Languages Taught", "languages_taught"),
+    ("💻 Device Policy", "device_policy_summary"),
+    ("🎯 Pedagogy", "pedagogy"),
+    ("💰 Fees", "fees_range"),
+]
+
+
+def _present(value) -> bool:
+    return value is not None and str(value).strip() != ""
+
+
+def _section(label: str, value) -> str:
+    return f'<div class="info-label">{label}</div><div class="info-value">{value}</div>'
+
+
+def _reviews(school: dict) -> str | None:
+    parts = []
+    for source, rating_key, reviews_key in (
+        ("Google", "google_rating", "google_reviews"),
+        ("Micole", "micole_rating", "micole_reviews"),
+    ):
+        rating, reviews = school.get(rating_key), school.get(reviews_key)
+        if _present(rating):
+            reviews_text = f" ({reviews} reviews)" if _present(reviews) else ""
+            parts.append(f"{source}: {rating}⭐{reviews_text}")
+    return " | ".join(parts) or None
+
+
+def _maps_link(school: dict) -> str | None:
+    try:
+        lat, lon = float(school.get("lat")), float(school.get("lon"))
+    except (ValueError, TypeError):
+        return None
+    if not (lat and lon):
+        return None
+    url = f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
+    return f'<a href="{url}" target="_blank">🗺️ Open in Google Maps</a>'
+
+
+def render_detail_html(school: dict) -> str:
+    """Full detail panel for one school record as a single HTML string."""
+    html = [
+        f'<div class="school-header">{school.get("name") or "Unknown School"}</div>',
+        f'<div class="school-type">{school.get("type") or "N/A"}</div>',
+    ]
+
+    # Special notes at the top as summary
+    special_notes = school.get("special_notes")
+    if _present(special_notes):
+        html.append(f'<div class="info-value" style="{NOTES_STYLE}">{special_notes}</div><hr>')
+
+    location_parts = [school.get("address") or "Address not available"]
+    if _present(school.get("neighborhood")):
+        location_parts.append(f"<i>{school['neighborhood']}</i>")
+    if _present(school.get("municipality")):
+        location_parts.append(f"<b>{school['municipality']}</b>")
+    html.append(_section("📍 Location", "<br>".join(location_parts)))
+
+    if school.get("founded"):
+        html.append(_section("📅 Founded", school["founded"]))
+    if _present(school.get("student_count")):
+        html.append(_section("👥 Students", school["student_count"]))
+
+    for label, field in TEXT_SECTIONS:
+        if _present(school.get(field)):
+            html.append(_section(label, school[field]))
+
+    reviews = _reviews(school)
+    if reviews:
+        html.append(_section("⭐ Reviews", reviews))
+
+    html.append("<hr>")
+    link = _maps_link(school)
+    if link:
+        html.append(f"<p>{link}</p>")
+    return "\n".join(html)
@@ -0,0 +1,199 @@
+"""
+export_site.py
+Export the explorer as a static site that any file server can host.
+
+Writes, from the same dataset, map and panel code the app uses:
+
+- index.html          the folium map from create_map (pins or clusters); each
+                      pin's popup links to the school's detail page
+- table.html          the "All Schools at a Glance" table from build_table,
+                      ranked by composite score (default weights), school
+                      names linking to the detail pages
+- schools/<id>.html   one page per school with the render_detail_html panel
+- schools.geojson     a FeatureCollection of the schools with their parsed
+                      ratings and fees, for other map clients
+
+No Python is needed to serve the result; Leaflet and its plugins load from
+the same CDNs the app uses.
+
+Usage:
+    python export_site.py [--output site] [--map-mode markers|cluster]
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import math
+import os
+import re
+
+import folium
+
+from dataset import frame_to_records, load_dataset
+from detail_panel import PANEL_CSS, render_detail_html
+from map_builder import create_map, school_coords
+from ranking import Ranking
+from table_builder import build_table
+
+OUTPUT_DIR = "site"
+SITE_TITLE = "Valencia Schools Explorer"
+
+# Parsed columns (see parsing.py) copied into the GeoJSON properties
+GEOJSON_PROPERTIES = [
+    "id", "name", "type", "municipality", "address", "ages",
+    "micole_rating_value", "google_rating_value", "student_count_value",
+    "fee_monthly_eur", "fee_annual_eur",
+]
+
+PAGE_CSS = """
+body { font-family: -apple-system, "Segoe UI", Roboto, Arial, sans-serif; margin: 2rem auto; max-width: 1100px; padding: 0 1rem; }
+h1 { color: #1f77b4; font-weight: 600; }
+nav a { margin-right: 1rem; }
+table { border-collapse: collapse; width: 100%; font-size: 0.9em; }
+th, td { border-bottom: 1px solid #e5e5e5; padding: 6px 8px; text-align: left; vertical-align: top; }
+th { background: #f0f2f6; position: sticky; top: 0; }
+"""
+
+# Binds a popup linking to the school's page on every marker carrying a
+# schoolId option, including cluster markers created later in the browser.
+# Runs once the map's own inline scripts have created the map and markers.
+LINK_SCRIPT = """
+document.addEventListener('DOMContentLoaded', function () {
+    var pages = %(pages)s;
+    function link(layer) {
+        var id = layer.options && layer.options.schoolId;
+        if (!id || !pages[id]) { return; }
+        var tooltip = layer.getTooltip && layer.getTooltip();
+        var name = tooltip ? tooltip.getContent() : id;
+        layer.bindPopup('<b>' + name + '</b><br><a href="' + pages[id] + '">School details &rarr;</a>');
+    }
+    %(map)s.eachLayer(link);
+    %(map)s.on('layeradd', function (e) { link(e.layer); });
+});
+"""
+
+NAV_HTML = """
+<div style="position: fixed; top: 10px; right: 10px; z-index: 1000; background: white;
+            padding: 6px 10px; border-radius: 6px; box-shadow: 0 1px 4px rgba(0,0,0,.3);
+            font-family: Arial; font-size: 13px;">
+    <b>%(title)s</b> &middot; <a href="table.html">All schools table</a> &middot;
+    <a href="schools.geojson">GeoJSON</a>
+</div>
+"""
+
+
+def page_name(school_id: str) -> str:
+    """File name of a school's detail page (ids are reduced to safe characters)."""
+    return re.sub(r"[^\w-]", "_", str(school_id)) + ".html"
+
+
+def _page(title: str, body: str, css: str = "") -> str:
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)}</title>
+<style>{PAGE_CSS}{css}</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _json_value(value):
+    """Plain JSON scalars from dataset values (NumPy numbers, NaN, pd.NA)."""
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        # Parsed values are float32; round off the widening noise
+        return None if math.isnan(value) else round(value, 4)
+    return value
+
+
+def export_map(schools: list[dict], mode: str, path: str) -> None:
+    m = create_map(schools, mode=mode)
+    pages = {s["id"]: f"schools/{page_name(s['id'])}" for s in schools}
+    m.get_root().html.add_child(folium.Element(NAV_HTML % {"title": SITE_TITLE}))
+    m.get_root().script.add_child(folium.Element(
+        LINK_SCRIPT % {"pages": json.dumps(pages), "map": m.get_name()}
+    ))
+    m.save(path)
+
+
+def export_table(df, path: str) -> None:
+    table = build_table(df, score=Ranking(df).scores)
+    cells = table.drop(columns="id").astype("string").fillna("").map(html.escape)
+    cells["School"] = [
+        f'<a href="schools/{page_name(i)}">{name}</a>' for i, name in zip(table["id"], cells["School"])
+    ]
+    body = (
+        '<nav><a href="index.html">&larr; Map</a><a href="schools.geojson">GeoJSON</a></nav>'
+        "<h1>📊 All Schools at a Glance</h1>"
+        + cells.to_html(index=False, escape=False, border=0)
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_page(f"All schools · {SITE_TITLE}", body))
+
+
+def export_details(schools: list[dict], directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for school in schools:
+        body = (
+            '<nav><a href="../index.html">&larr; Map</a><a href="../table.html">All schools</a></nav>'
+            + render_detail_html(school)
+        )
+        title = f"{school.get('name') or school['id']} · {SITE_TITLE}"
+        with open(os.path.join(directory, page_name(school["id"])), "w", encoding="utf-8") as f:
+            f.write(_page(title, body, PANEL_CSS))
+
+
+def schools_geojson(schools: list[dict]) -> dict:
+    features = []
+    for school in schools:
+        coords = school_coords(school)
+        if coords is None:
+            continue
+        properties = {k: _json_value(school.get(k)) for k in GEOJSON_PROPERTIES}
+        properties["url"] = f"schools/{page_name(school['id'])}"
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [coords[1], coords[0]]},
+            "properties": properties,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def export_site(output: str = OUTPUT_DIR, mode: str | None = None) -> int:
+    """Write the static site; returns the number of schools exported."""
+    df = load_dataset()
+    schools = frame_to_records(df)
+    mode = mode or ("markers" if len(schools) <= 500 else "cluster")
+    os.makedirs(output, exist_ok=True)
+
+    export_map(schools, mode, os.path.join(output, "index.html"))
+    export_table(df, os.path.join(output, "table.html"))
+    export_details(schools, os.path.join(output, "schools"))
+    with open(os.path.join(output, "schools.geojson"), "w", encoding="utf-8") as f:
+        json.dump(schools_geojson(schools), f, ensure_ascii=False)
+    return len(schools)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the schools explorer as a static site.")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--map-mode", choices=["markers", "cluster"],
+                        help="default: individual pins up to 500 schools, clusters above")
+    args = parser.parse_args()
+    count = export_site(args.output, args.map_mode)
+    print(f"Exported {count} schools to {args.output}/")
+
+
+if __name__ == "__main__":
+    main()
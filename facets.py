@@ -0,0 +1,201 @@
+"""
+facets.py
+Faceted filtering backed by precomputed bitmap indexes.
+
+Each facet value maps to a bitmap (a Python int, bit i = dataset row i) that
+is computed once from the loaded frame. Applying a filter is then a few
+bitwise ORs (values within a facet) and ANDs (across facets), and a facet
+count is a popcount, instead of a scan over every record's text fields.
+When rows are edited in place, patched() recomputes only their bits.
+
+Facet values are derived from the free-text columns:
+- type:         Public / Private / Concertado (a school can be several)
+- municipality: as recorded
+- language:     languages named in languages_day_to_day
+- curriculum:   curriculum family keywords in curriculum/pedagogy
+- age band:     bands overlapping the "X to Y years" range in ages; a range
+                that only touches a band's edge (a "3 to 12 years" primary
+                and "Secondary (12–16)") is not in it
+"""
+
+from __future__ import annotations
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+# facet -> (source columns, {value: regex}); municipality and age band are built separately
+KEYWORD_FACETS = {
+    "type": (["type"], {
+        "Public": r"\bpublic\b",
+        "Private": r"\bprivate\b",
+        "Concertado": r"\bconcertad[oa]\b",
+    }),
+    "language": (["languages_day_to_day"], {
+        "English": r"\benglish\b",
+        "Spanish": r"\bspanish\b(?!\s+sign)|\bcastellano\b",
+        "Valencian": r"\bvalenci(?:an|ano|à)\b",
+        "German": r"\bgerman\b",
+        "French": r"\bfrench\b",
+        "Sign language": r"\bsign language\b|\blengua de signos\b",
+    }),
+    "curriculum": (["curriculum", "pedagogy"], {
+        "British": r"\bbritish\b|\bigcse\b|\ba-levels?\b",
+        "American": r"\bamerican\b|\bcommon core\b",
+        "German": r"\bgerman\b|\babitur\b",
+        "IB": r"\bib\b|international baccalaureate",
+        "Spanish national": r"spanish national|\blomloe\b",
+        "Montessori": r"\bmontessori\b",
+    }),
+}
+
+# label -> [start, end) in years
+AGE_BANDS = {
+    "Nursery (0–3)": (0, 3),
+    "Infant (3–6)": (3, 6),
+    "Primary (6–12)": (6, 12),
+    "Secondary (12–16)": (12, 16),
+    "Upper secondary (16–18)": (16, 18),
+}
+
+FACET_LABELS = {
+    "type": "Type",
+    "municipality": "Municipality",
+    "language": "Day-to-day language",
+    "curriculum": "Curriculum",
+    "age_band": "Age band",
+}
+
+
+def _bitmap(mask: np.ndarray) -> int:
+    """Pack a boolean array into an int with bit i set for row i."""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def _text(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+    parts = [df[c].astype("string").fillna("") for c in columns if c in df]
+    if not parts:
+        return pd.Series("", index=df.index, dtype="string")
+    text = parts[0]
+    for part in parts[1:]:
+        text = text + " " + part
+    return text
+
+
+def age_range(ages: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized (min_years, max_years) from "20 months to 6 years"-style text."""
+    found = ages.astype("string").str.extract(
+        r"(\d+(?:\.\d+)?)\s*(months?)?\s*(?:to|–|-)\s*(\d+(?:\.\d+)?)", expand=True
+    )
+    lo = pd.to_numeric(found[0], errors="coerce").astype("float64")
+    lo = lo.where(found[1].isna(), lo / 12)
+    hi = pd.to_numeric(found[2], errors="coerce").astype("float64")
+    return lo.to_numpy(dtype="float64", na_value=np.nan), hi.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def overlaps_band(lo: np.ndarray, hi: np.ndarray, start: float, end: float) -> np.ndarray:
+    """Rows whose [lo, hi) age range shares more than an edge with [start, end).
+
+    >>> lo, hi = np.array([3.0, 20 / 12, 12.0]), np.array([12.0, 6.0, 18.0])
+    >>> overlaps_band(lo, hi, 12, 16)
+    array([False, False,  True])
+    >>> overlaps_band(lo, hi, 6, 12)
+    array([ True, False, False])
+    """
+    return (lo < end) & (hi > start)
+
+
+def facet_masks(df: pd.DataFrame) -> dict[str, dict[str, np.ndarray]]:
+    """Boolean row mask of every facet value, over the rows of df."""
+    masks = {}
+    for facet, (columns, patterns) in KEYWORD_FACETS.items():
+        text = _text(df, columns)
+        masks[facet] = {
+            value: text.str.contains(pattern, case=False, regex=True).to_numpy(dtype=bool)
+            for value, pattern in patterns.items()
+        }
+
+    municipality = df["municipality"].astype("string") if "municipality" in df else None
+    masks["municipality"] = {}
+    if municipality is not None:
+        for value in sorted(municipality.dropna().unique()):
+            masks["municipality"][value] = (municipality == value).to_numpy(dtype=bool, na_value=False)
+
+    lo, hi = age_range(df["ages"]) if "ages" in df else (np.full(len(df), np.nan),) * 2
+    masks["age_band"] = {
+        label: overlaps_band(lo, hi, start, end)
+        for label, (start, end) in AGE_BANDS.items()
+    }
+    return masks
+
+
+class FacetIndex:
+    """Bitmaps for every facet value over the rows of one dataset frame."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.all_rows = (1 << self.size) - 1
+        # Drop values no school has, so the sidebar only offers real options
+        self.bitmaps: dict[str, dict[str, int]] = {
+            facet: {v: bits for v, bits in ((v, _bitmap(m)) for v, m in values.items()) if bits}
+            for facet, values in facet_masks(df).items()
+        }
+
+    def patched(self, df: pd.DataFrame, positions) -> FacetIndex:
+        """A copy with the bits of the rows at `positions` recomputed from df,
+        the frame this index was built from with those rows edited in place."""
+        positions = np.asarray(positions, dtype=np.intp)
+        rows = np.zeros(self.size, dtype=bool)
+        rows[positions] = True
+        keep = ~_bitmap(rows)
+
+        patched = copy.copy(self)
+        patched.bitmaps = {}
+        for facet, masks in facet_masks(df.iloc[positions]).items():
+            values = {}
+            for value in dict.fromkeys([*self.bitmaps.get(facet, {}), *masks]):
+                bits = self.bitmaps.get(facet, {}).get(value, 0) & keep
+                if value in masks:
+                    rows[:] = False
+                    rows[positions] = masks[value]
+                    bits |= _bitmap(rows)
+                if bits:
+                    values[value] = bits
+            if facet == "municipality":
+                values = dict(sorted(values.items()))
+            patched.bitmaps[facet] = values
+        return patched
+
+    def mask(self, selection: dict[str, list[str]], exclude: str | None = None) -> int:
+        """Rows matching any selected value in every facet (all rows if none selected)."""
+        result = self.all_rows
+        for facet, values in selection.items():
+            if facet == exclude or not values:
+                continue
+            facet_bits = 0
+            for value in values:
+                facet_bits |= self.bitmaps.get(facet, {}).get(value, 0)
+            result &= facet_bits
+        return result
+
+    def counts(self, selection: dict[str, list[str]]) -> dict[str, dict[str, int]]:
+        """Per-value counts for each facet, given the selections in the other facets."""
+        out = {}
+        for facet, values in self.bitmaps.items():
+            base = self.mask(selection, exclude=facet)
+            out[facet] = {value: (bits & base).bit_count() for value, bits in values.items()}
+        return out
+
+    def positions(self, mask: int) -> np.ndarray:
+        """Row positions of the set bits in a mask."""
+        if self.size == 0:
+            return np.empty(0, dtype=np.intp)
+        raw = np.frombuffer(mask.to_bytes((self.size + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder="little")[:self.size])
+
+
+def selection_key(selection: dict[str, list[str]]) -> tuple | None:
+    """Hashable, order-independent cache key for a facet selection (None if empty)."""
+    key = tuple(sorted((f, tuple(sorted(v))) for f, v in selection.items() if v))
+    return key or None
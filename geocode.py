@@ -0,0 +1,270 @@
+"""
+geocode.py
+Offline, resumable batch geocoding of school addresses.
+
+Many records only have approximate coordinates (coords_confidence such as
+"approximate_neighborhood", notes saying "VERIFY EXACT LOCATION"). This
+command geocodes the addresses in the loaded dataset and stores every answer
+in an SQLite cache keyed by the normalized address:
+
+- an address is never sent to the geocoder twice: cached answers (including
+  "not found") are reused, duplicates within a run are collapsed, and only
+  transient errors are retried on the next run
+- results are committed one by one, so an interrupted run resumes where it
+  stopped
+- requests go through a shared rate limiter, with a bounded worker pool
+
+The app geocodes a typed home address through geocode_address(), which
+shares the cache and is spaced by one process-wide RateLimiter.
+
+The geocoder is pluggable: anything with a geopy-style .geocode(query) method
+or a plain callable returning (lat, lon[, label]) or None. Pass
+--geocoder module:attribute to use a local stand-in instead of Nominatim.
+
+Usage:
+    python geocode.py [--cache geocode_cache.sqlite] [--uncertain-only]
+                      [--rate 1.0] [--workers 2] [--geocoder module:attr]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dataset import load_dataset, frame_to_records
+from proximity import haversine_km
+
+CACHE_FILE = "geocode_cache.sqlite"
+USER_AGENT = "schoolmap-geocoder"
+
+# Nominatim's usage policy: at most one request per second
+MIN_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    address_key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL,          -- 'ok', 'not_found' or 'error'
+    lat REAL,
+    lon REAL,
+    label TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def normalize_address(address: str) -> str:
+    """Cache key for an address: accent-folded, casefolded, punctuation-light."""
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = re.sub(r"[^\w/]+", " ", text)
+    return " ".join(text.split())
+
+
+def geocoding_query(address: str) -> str:
+    """Strip editorial notes, campus labels and second campuses from an address."""
+    text = re.split(r"\s+NOTE:", address)[0]
+    text = text.split(";")[0]
+    text = re.sub(r"^[^,:]{1,30}:\s*", "", text)  # "Main Campus: ...", "Primary: ..."
+    text = re.sub(r"\s*\([^)]*\)", "", text)
+    return text.strip(" .")
+
+
+class RateLimiter:
+    """Spaces calls at least min_interval seconds apart across all threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GeocodeCache:
+    """SQLite store of geocoding answers keyed by normalized address."""
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def get(self, key: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT status, lat, lon, label, error FROM geocodes WHERE address_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "lat", "lon", "label", "error"), row))
+
+    def done_keys(self) -> set[str]:
+        """Keys with a final answer; 'error' rows are retried."""
+        rows = self.conn.execute("SELECT address_key FROM geocodes WHERE status != 'error'")
+        return {r[0] for r in rows}
+
+    def put(self, key: str, query: str, result: dict) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, query, result["status"], result.get("lat"), result.get("lon"),
+             result.get("label"), result.get("error"), time.time()),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def as_lookup(geocoder):
+    """Adapt a geopy geocoder or a plain callable to query -> (lat, lon, label) | None."""
+    fn = geocoder.geocode if hasattr(geocoder, "geocode") else geocoder
+
+    def lookup(query):
+        answer = fn(query)
+        if answer is None:
+            return None
+        if hasattr(answer, "latitude"):  # geopy Location
+            return answer.latitude, answer.longitude, getattr(answer, "address", None)
+        lat, lon, *rest = answer
+        return float(lat), float(lon), rest[0] if rest else None
+
+    return lookup
+
+
+def default_geocoder():
+    from geopy.geocoders import Nominatim
+    return Nominatim(user_agent=USER_AGENT, timeout=10)
+
+
+def load_geocoder(spec: str):
+    """Resolve a "module:attribute" spec; classes are instantiated."""
+    module_name, _, attr = spec.partition(":")
+    obj = getattr(importlib.import_module(module_name), attr or "geocode")
+    return obj() if isinstance(obj, type) else obj
+
+
+def _geocode_one(lookup, limiter: RateLimiter, query: str) -> dict:
+    limiter.wait()
+    try:
+        answer = lookup(query)
+    except Exception as exc:  # geocoder/network failure: retried next run
+        return {"status": "error", "error": f"{type(exc).__name__}: {exc}"}
+    if answer is None:
+        return {"status": "not_found"}
+    lat, lon, label = answer
+    return {"status": "ok", "lat": lat, "lon": lon, "label": label}
+
+
+def geocode_address(address: str, geocoder, cache: GeocodeCache, limiter: RateLimiter) -> dict:
+    """Answer one address from the cache, else from the geocoder through limiter.
+
+    Returns the result dict ('status' is 'ok', 'not_found' or 'error'); like a
+    batch run, cached 'error' answers are retried.
+    """
+    key = normalize_address(address)
+    hit = cache.get(key)
+    if hit is not None and hit["status"] != "error":
+        return hit
+    result = _geocode_one(as_lookup(geocoder), limiter, address)
+    cache.put(key, address, result)
+    return result
+
+
+def geocode_addresses(addresses, geocoder, cache: GeocodeCache,
+                      min_interval: float = MIN_INTERVAL, workers: int = 2, progress=None) -> dict[str, int]:
+    """Geocode every address not already answered in the cache.
+
+    Returns counts of {'cached', 'ok', 'not_found', 'error'} for this run.
+    """
+    lookup = as_lookup(geocoder)
+    limiter = RateLimiter(min_interval)
+    done = cache.done_keys()
+
+    pending: dict[str, str] = {}
+    counts = {"cached": 0, "ok": 0, "not_found": 0, "error": 0}
+    for address in addresses:
+        if not address:
+            continue
+        key = normalize_address(address)
+        if key in done:
+            counts["cached"] += 1
+        elif key not in pending:
+            pending[key] = address
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_geocode_one, lookup, limiter, q): (k, q) for k, q in pending.items()}
+        try:
+            for future in as_completed(futures):
+                key, query = futures[future]
+                result = future.result()
+                cache.put(key, query, result)  # committed per answer, so runs resume
+                counts[result["status"]] += 1
+                if progress:
+                    progress(query, result)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+    return counts
+
+
+def needs_verification(school: dict) -> bool:
+    """True for schools whose coordinates are flagged as approximate or unverified."""
+    confidence = str(school.get("coords_confidence") or "").lower()
+    notes = " ".join(str(school.get(k) or "") for k in ("coords_note", "notes")).upper()
+    return not confidence.startswith("verified") or "VERIFY" in notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-geocode school addresses into an SQLite cache.")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--uncertain-only", action="store_true",
+                        help="only schools whose coordinates are approximate or flagged VERIFY")
+    parser.add_argument("--rate", type=float, default=MIN_INTERVAL, help="minimum seconds between requests")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--geocoder", help="module:attribute of a geocoder to use instead of Nominatim")
+    args = parser.parse_args()
+
+    schools = frame_to_records(load_dataset())
+    if args.uncertain_only:
+        schools = [s for s in schools if needs_verification(s)]
+    geocoder = load_geocoder(args.geocoder) if args.geocoder else default_geocoder()
+
+    cache = GeocodeCache(args.cache)
+    try:
+        counts = geocode_addresses(
+            [geocoding_query(s.get("address") or "") for s in schools], geocoder, cache,
+            min_interval=args.rate, workers=args.workers,
+            progress=lambda q, r: print(f"  [{r['status']}] {q}"),
+        )
+        print("Done: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+        # Report how far the geocoded positions are from the stored ones
+        for school in schools:
+            hit = cache.get(normalize_address(geocoding_query(school.get("address") or "")))
+            if not hit or hit["status"] != "ok" or school.get("lat") is None:
+                continue
+            dist = haversine_km(school["lat"], school["lon"], hit["lat"], hit["lon"])
+            if dist > 0.1:
+                print(f"  {school['id']}: stored position is {dist:.2f} km from geocoded "
+                      f"({hit['lat']:.5f}, {hit['lon']:.5f})")
+    except KeyboardInterrupt:
+        print("Interrupted; rerun to resume.")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+live_data.py
+Incremental reload of the dataset with row-level diffing.
+
+The app keeps one LiveDataset per process. Each rerun calls refresh(), which
+stats the data files (dataset.current_version) and, when they changed,
+reloads the frame and diffs it against the previous one by school id:
+
+- an edited source recompiles the merged snapshot before the reload (see
+  dataset.rebuild_stale_snapshot), so old and new frames have the same
+  columns and the diff sees only the edited cells; if recompiling fails, the
+  CSV-only frame lacks the merged columns and every row counts as changed
+- school records (by_id) are built from the frame on first access and
+  cached per row; a reload carries over the cached records of unchanged rows.
+  Nothing converts every row up front, so the frame's string columns stay in
+  the memory-mapped snapshot instead of being copied into each worker
+- every derived artifact (map layer, facet bitmaps, search index, ranking,
+  table, comparison view, spatial and proximity indexes) is tracked with the
+  version at which its input columns last changed, and the app caches each
+  artifact under that key, so an edit to a column an artifact does not read
+  keeps its cache
+- objects the app builds through DatasetSnapshot.derive with a patch
+  function (facet bitmaps, search index, table) are carried to the next
+  snapshot and patched for just the edited rows, instead of rebuilt, when
+  rows were only edited in place
+- each row has its own version, which keys the per-school detail panel
+
+Editing one school's name therefore patches that row's facet bits, search
+postings and table row, drops one cached record and re-renders one detail
+panel. The map payload and the comparison view are rebuilt: the map is
+serialized JavaScript, with no per-row parts to replace, and the comparison
+covers only the few selected schools. Adding, removing or reordering rows
+moves row positions, which every positional artifact depends on, so that
+rebuilds all of them.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import pandas as pd
+
+from comparison import COMPARE_COLUMNS
+from dataset import current_version, frame_to_records, load_dataset
+from facets import KEYWORD_FACETS
+from ranking import RATING_SOURCES
+from table_builder import TEXT_COLUMNS
+from text_search import SEARCH_FIELDS
+
+# artifact -> dataset columns it is built from
+ARTIFACT_COLUMNS = {
+    "spatial": {"id", "lat", "lon"},
+    "map": {"id", "name", "type", "lat", "lon"},
+    "facets": {"id", "municipality", "ages"} | {c for cols, _ in KEYWORD_FACETS.values() for c in cols},
+    "search": {"id"} | set(SEARCH_FIELDS),
+    "table": {"id", "device_policy_summary", "micole_rating_value"} | set(TEXT_COLUMNS.values()),
+    "ranking": {"id"} | {c for cols in RATING_SOURCES.values() for c in cols},
+    "compare": {"id", "name", "lat", "lon"} | set(COMPARE_COLUMNS),
+    "proximity": {"id", "lat", "lon", "name", "type", "municipality"},
+}
+
+# Most objects a snapshot keeps from derive(); the least recently built go first
+MAX_DERIVED = 64
+
+
+class RowDiff:
+    """Rows added, removed and edited (with the edited columns) between two frames."""
+
+    def __init__(self, added, removed, changed: dict[str, frozenset[str]], reordered: bool):
+        self.added = tuple(added)
+        self.removed = tuple(removed)
+        self.changed = changed
+        self.reordered = reordered
+
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset().union(*self.changed.values()) if self.changed else frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed or self.reordered)
+
+    def __repr__(self) -> str:
+        return (f"RowDiff(added={len(self.added)}, removed={len(self.removed)}, "
+                f"changed={len(self.changed)}, reordered={self.reordered})")
+
+
+def _comparable(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    return df[columns].astype(object).where(df[columns].notna(), None)
+
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame) -> RowDiff:
+    """Diff two dataset frames by school id."""
+    old_ids = old["id"].astype("string")
+    new_ids = new["id"].astype("string")
+    if old_ids.duplicated().any() or new_ids.duplicated().any():
+        # Ids cannot be matched reliably: treat everything as replaced
+        return RowDiff(new_ids, old_ids, {}, True)
+
+    added = new_ids[~new_ids.isin(old_ids)].tolist()
+    removed = old_ids[~old_ids.isin(new_ids)].tolist()
+    common = new_ids[new_ids.isin(old_ids)]
+    reordered = bool(added or removed) or old_ids[old_ids.isin(new_ids)].tolist() != common.tolist()
+
+    shared = [c for c in new.columns if c in old.columns]
+    only_one_side = frozenset(set(old.columns) ^ set(new.columns))
+    a = _comparable(old.set_axis(old_ids.to_numpy(), axis=0), shared).loc[common.to_numpy()]
+    b = _comparable(new.set_axis(new_ids.to_numpy(), axis=0), shared).loc[common.to_numpy()]
+    differs = ~((a == b) | (a.isna() & b.isna()))
+
+    changed = {}
+    for school_id, row in zip(common, differs.to_numpy()):
+        columns = frozenset(c for c, d in zip(shared, row) if d) | only_one_side
+        if columns:
+            changed[school_id] = columns
+    return RowDiff(added, removed, changed, reordered)
+
+
+class SchoolRecords(Mapping):
+    """School id -> read-only record, converted from the frame on first access.
+
+    Ids map to row positions; each record is built from its row with iloc
+    when first looked up and kept for later lookups. When ids repeat, the
+    last row wins.
+    """
+
+    def __init__(self, frame: pd.DataFrame, cached: dict | None = None):
+        self._frame = frame
+        ids = frame["id"].astype("string")
+        self._positions = dict(zip(ids, range(len(ids))))
+        self._cached = {i: r for i, r in (cached or {}).items() if i in self._positions}
+
+    def __getitem__(self, school_id):
+        record = self._cached.get(school_id)
+        if record is None:
+            position = self._positions[school_id]
+            record = MappingProxyType(frame_to_records(self._frame.iloc[[position]])[0])
+            self._cached[school_id] = record
+        return record
+
+    def __contains__(self, school_id) -> bool:
+        return school_id in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def position(self, school_id) -> int:
+        """Row position of a school in the frame."""
+        return self._positions[school_id]
+
+    def cached(self) -> dict:
+        """The records converted so far, by id."""
+        return dict(self._cached)
+
+
+class DatasetSnapshot:
+    """One immutable state of the dataset, shared read-only by all sessions."""
+
+    def __init__(self, version: str, frame: pd.DataFrame, by_id: SchoolRecords,
+                 artifact_versions: dict[str, str], row_versions: dict[str, str],
+                 derived: dict | None = None):
+        self.version = version
+        self.frame = frame
+        self.by_id = by_id
+        self.artifact_versions = MappingProxyType(artifact_versions)
+        self.row_versions = MappingProxyType(row_versions)
+        # (name, params) -> (artifacts, key, value, patch, row positions still to patch)
+        self._derived = OrderedDict(derived or {})
+        self._derived_lock = threading.Lock()
+
+    def key(self, *artifacts: str) -> tuple[str, ...]:
+        """Cache key for something built from the given artifacts."""
+        return tuple(self.artifact_versions[a] for a in artifacts)
+
+    def derive(self, name: str, artifacts: tuple[str, ...], build, patch=None, params=()):
+        """build(frame) for the given artifacts and params, kept with the snapshot.
+
+        Reloads carry the value to the next snapshot: as is when none of the
+        artifacts changed, and, given a patch function, through
+        patch(value, frame, positions) when rows were only edited in place and
+        of the artifacts only the first one changed (the others, e.g. a
+        table's ranking and filter, decide which rows it holds). Otherwise it
+        is built again.
+        """
+        slot = (name, params)
+        key = self.key(*artifacts)
+        entry = self._derived.get(slot)
+        if entry is not None and entry[1] == key and not entry[4]:
+            return entry[2]
+        if entry is not None and entry[1] == key:
+            value = patch(entry[2], self.frame, sorted(entry[4]))
+        else:
+            value = build(self.frame)
+        with self._derived_lock:
+            self._derived[slot] = (artifacts, key, value, patch, frozenset())
+            self._derived.move_to_end(slot)
+            while len(self._derived) > MAX_DERIVED:
+                self._derived.popitem(last=False)
+        return value
+
+    def carry_over(self, artifact_versions: dict[str, str], edited: dict[str, frozenset[int]]) -> dict:
+        """Derived values to hand to the next snapshot (see derive), given its
+        artifact versions and, per artifact, the positions of rows edited in
+        its columns (empty when rows were added, removed or reordered)."""
+        carried = {}
+        with self._derived_lock:
+            entries = list(self._derived.items())
+        for slot, (artifacts, key, value, patch, pending) in entries:
+            new_key = tuple(artifact_versions[a] for a in artifacts)
+            if new_key == key:
+                carried[slot] = (artifacts, key, value, patch, pending)
+            elif patch is not None and new_key[1:] == key[1:] and edited.get(artifacts[0]):
+                carried[slot] = (artifacts, new_key, value, patch, pending | edited[artifacts[0]])
+        return carried
+
+
+class LiveDataset:
+    """The current DatasetSnapshot, reloaded incrementally when the files change."""
+
+    def __init__(self, loader=load_dataset, version_fn=current_version):
+        self.loader = loader
+        self.version_fn = version_fn
+        self.last_diff: RowDiff | None = None
+        self._lock = threading.Lock()
+        version = version_fn()
+        frame = loader()
+        self.snapshot = DatasetSnapshot(
+            version, frame, SchoolRecords(frame),
+            {a: version for a in ARTIFACT_COLUMNS},
+            {i: version for i in frame["id"].astype("string")},
+        )
+
+    def refresh(self) -> DatasetSnapshot:
+        """Reload if the data files changed; returns the snapshot to use for this rerun."""
+        if self.version_fn() == self.snapshot.version:
+            return self.snapshot
+        with self._lock:
+            version = self.version_fn()
+            if version != self.snapshot.version:  # not already done by another session
+                self.snapshot, self.last_diff = self._reload(self.snapshot, version)
+        return self.snapshot
+
+    def _reload(self, old: DatasetSnapshot, version: str) -> tuple[DatasetSnapshot, RowDiff]:
+        frame = self.loader()
+        diff = diff_frames(old.frame, frame)
+
+        ids = frame["id"].astype("string")
+        stale = set(diff.added) | set(diff.changed)
+        by_id = SchoolRecords(frame, {i: r for i, r in old.by_id.cached().items() if i not in stale})
+
+        artifact_versions = dict(old.artifact_versions)
+        for artifact, columns in ARTIFACT_COLUMNS.items():
+            if diff.reordered or diff.changed_columns & columns:
+                artifact_versions[artifact] = version
+
+        row_versions = {i: old.row_versions.get(i, version) for i in ids}
+        for i in stale:
+            row_versions[i] = version
+
+        edited = {}
+        if not diff.reordered:  # same rows at the same positions, some edited
+            edited = {
+                artifact: frozenset(by_id.position(i) for i, cols in diff.changed.items() if cols & columns)
+                for artifact, columns in ARTIFACT_COLUMNS.items()
+            }
+        derived = old.carry_over(artifact_versions, edited)
+
+        return DatasetSnapshot(version, frame, by_id, artifact_versions, row_versions, derived), diff
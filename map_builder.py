@@ -0,0 +1,317 @@
+"""
+map_builder.py
+Folium map construction for the schools explorer.
+
+Four rendering modes are supported:
+- "markers":  one folium.Marker (icon + popup) per school; fine for small datasets
+- "cluster":  a single FastMarkerCluster fed from plain coordinate arrays; the
+              browser creates markers lazily, so the page stays small
+- "viewport": base map only, opened at the default view; the markers inside
+              the visible bounds are sent as a separate FeatureGroup (see
+              visible_schools / marker_layer)
+- "geojson":  one compact GeoJSON FeatureCollection (id, name, kind per school)
+              drawn as circle markers and styled in the browser by kind
+
+Schools in the optional `highlight` id set (full-text search matches) are drawn
+in HIGHLIGHT_COLOR with a star icon in every mode.
+
+Every school's tooltip ends with its id in a hidden span (see tooltip_html):
+st_folium reports only the clicked marker's position and tooltip text, not its
+options, so this is how a click is resolved to a school id.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+
+import folium
+from folium.plugins import FastMarkerCluster
+from folium.utilities import JsCode
+
+MAP_MODES = ("markers", "cluster", "viewport", "geojson")
+
+# Default to Valencia center if no valid coordinates
+DEFAULT_CENTER = (39.4699, -0.3763)
+ZOOM_START = 11
+
+# Half-size of the area the map shows at ZOOM_START (about; the map size is
+# up to the browser), used until the map has reported its bounds
+INITIAL_SPAN_DEG = (0.15, 0.3)
+
+TILES = "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png"
+ATTRIBUTION = '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
+
+HIGHLIGHT_COLOR = "green"
+HIGHLIGHT_ICON = "star"
+
+# Hex equivalents of the marker colors, for the GeoJSON circle markers
+KIND_COLORS = {"public": "#38aadd", "private": "#ff8e7f", "match": "#72b026"}
+GEOJSON_PRECISION = 5  # ~1 m
+
+# Dataset columns the map reads from each school (see map_records)
+MAP_COLUMNS = ("id", "name", "type", "lat", "lon")
+
+# Precedes the school id hidden at the end of each tooltip (U+2063, invisible)
+TOOLTIP_ID_SEPARATOR = "\u2063"
+TOOLTIP_ID_HTML = '<span style="display:none">' + TOOLTIP_ID_SEPARATOR + '%s</span>'
+
+# Styles each GeoJSON point by its kind and attaches the name tooltip (with the hidden id)
+GEOJSON_ON_EACH_FEATURE = """
+function (feature, layer) {
+    var colors = %s;
+    var color = colors[feature.properties.match ? "match" : feature.properties.kind];
+    layer.setStyle({color: "#ffffff", weight: 1, fillColor: color, fillOpacity: 0.9});
+    layer.bindTooltip(feature.properties.name + '%s'.replace('%%s', feature.properties.id));
+}
+"""
+
+# Builds each clustered marker client-side from a [lat, lon, color, name, id, icon] row
+CLUSTER_CALLBACK = """
+var callback = function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: row[5], prefix: 'fa', markerColor: row[2]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon, schoolId: row[4]});
+    marker.bindTooltip(row[3] + '%s'.replace('%%s', row[4]));
+    return marker;
+};
+""" % TOOLTIP_ID_HTML
+
+
+def school_coords(school: dict) -> tuple[float, float] | None:
+    """Return (lat, lon) as floats, or None if the school has no usable position."""
+    lat, lon = school.get("lat"), school.get("lon")
+    if lat is None or lon is None:
+        return None
+    try:
+        lat, lon = float(lat), float(lon)
+    except (ValueError, TypeError):
+        return None
+    if math.isnan(lat) or math.isnan(lon):
+        return None
+    return lat, lon
+
+
+def marker_color(school: dict, highlighted: bool = False) -> str:
+    """Color code: blue for public, red for private, green for search matches."""
+    if highlighted:
+        return HIGHLIGHT_COLOR
+    school_type = str(school.get("type", "")).lower()
+    return "blue" if "public" in school_type else "lightred"
+
+
+def popup_html(school: dict) -> str:
+    return f"""
+        <div style="font-family: Arial; min-width: 200px; max-width: 300px;">
+            <b style="font-size: 14px; color: #2c3e50;">{school.get('name', 'Unknown School')}</b><br>
+            <span style="font-size: 12px; color: #7f8c8d;">{school.get('type', 'N/A')}</span><br>
+            <span style="font-size: 11px; color: #95a5a6; margin-top: 4px; display: block;">
+                Click for details
+            </span>
+        </div>
+        """
+
+
+def tooltip_html(school: dict) -> str:
+    """Marker tooltip: the school name, then its id in a hidden span."""
+    return (school.get('name') or 'Unknown School') + TOOLTIP_ID_HTML % school['id']
+
+
+def tooltip_school_id(tooltip: str | None) -> str | None:
+    """School id from the text of a clicked marker's tooltip, if it carries one."""
+    if not tooltip or TOOLTIP_ID_SEPARATOR not in tooltip:
+        return None
+    return tooltip.rpartition(TOOLTIP_ID_SEPARATOR)[2].strip() or None
+
+
+def map_records(df) -> list[dict]:
+    """The MAP_COLUMNS of each row of a dataset frame, as small dicts.
+
+    Built for one map and dropped with it; drawing the map never needs the
+    schools' full records.
+    """
+    rows = df[[c for c in MAP_COLUMNS if c in df.columns]]
+    return rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+
+def map_center(schools) -> tuple[float, float]:
+    """Mean position of all schools with valid coordinates."""
+    coords = [c for c in (school_coords(s) for s in schools) if c]
+    if not coords:
+        return DEFAULT_CENTER
+    return (
+        sum(c[0] for c in coords) / len(coords),
+        sum(c[1] for c in coords) / len(coords),
+    )
+
+
+def base_map(center: tuple[float, float]) -> folium.Map:
+    """Create map with minimal black and white style."""
+    return folium.Map(
+        location=list(center),
+        zoom_start=ZOOM_START,
+        tiles=TILES,
+        attr=ATTRIBUTION,
+        control_scale=True
+    )
+
+
+def add_markers(target, schools, highlight=frozenset()) -> None:
+    """Add one marker per school with valid coordinates to a map or feature group."""
+    for school in schools:
+        coords = school_coords(school)
+        if coords is None:
+            continue
+        highlighted = school['id'] in highlight
+        folium.Marker(
+            location=list(coords),
+            popup=folium.Popup(popup_html(school), max_width=300),
+            tooltip=tooltip_html(school),
+            icon=folium.Icon(
+                color=marker_color(school, highlighted),
+                icon=HIGHLIGHT_ICON if highlighted else "graduation-cap",
+                prefix='fa'
+            ),
+            school_id=school['id']
+        ).add_to(target)
+
+
+def cluster_layer(schools, highlight=frozenset()) -> FastMarkerCluster:
+    """One clustered layer built from plain coordinate rows."""
+    rows = []
+    for school in schools:
+        coords = school_coords(school)
+        if coords is None:
+            continue
+        highlighted = school['id'] in highlight
+        rows.append([
+            coords[0], coords[1], marker_color(school, highlighted),
+            school.get('name') or 'Unknown School', school['id'],
+            HIGHLIGHT_ICON if highlighted else "graduation-cap",
+        ])
+    return FastMarkerCluster(rows, callback=CLUSTER_CALLBACK, name="Schools")
+
+
+def marker_layer(schools, highlight=frozenset()) -> folium.FeatureGroup:
+    """Markers for a subset of schools, for st_folium(feature_group_to_add=...)."""
+    group = folium.FeatureGroup(name="Schools")
+    add_markers(group, schools, highlight)
+    return group
+
+
+def feature_collection(schools, highlight=frozenset()) -> dict:
+    """Compact GeoJSON of the schools: position plus id, name and kind only."""
+    features = []
+    for school in schools:
+        coords = school_coords(school)
+        if coords is None:
+            continue
+        properties = {
+            "id": school['id'],
+            "name": school.get('name') or 'Unknown School',
+            "kind": "public" if marker_color(school) == "blue" else "private",
+        }
+        if school['id'] in highlight:
+            properties["match"] = 1
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [round(coords[1], GEOJSON_PRECISION), round(coords[0], GEOJSON_PRECISION)],
+            },
+            "properties": properties,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def geojson_layer(schools, highlight=frozenset()) -> folium.GeoJson:
+    """All schools as one GeoJSON layer of small circle markers.
+
+    Circle markers with a radius of at most 10px report their own position
+    on click, like pins, so click resolution works unchanged.
+    """
+    return folium.GeoJson(
+        feature_collection(schools, highlight),
+        name="Schools",
+        marker=folium.CircleMarker(radius=7, fill=True),
+        on_each_feature=JsCode(GEOJSON_ON_EACH_FEATURE % (json.dumps(KIND_COLORS), TOOLTIP_ID_HTML)),
+        control=False,
+    )
+
+
+# Isochrone fill per band (shortest band first), see travel_time.py
+ISOCHRONE_COLORS = ["#1a9850", "#fee08b", "#f46d43"]
+
+
+def isochrone_layer(collection: dict) -> folium.GeoJson:
+    """Travel-time bands as filled polygons under the school markers.
+
+    The layer is not interactive, so clicks still reach the pins (and are
+    never resolved to a school from inside a polygon).
+    """
+    def style(feature):
+        color = ISOCHRONE_COLORS[feature["properties"]["band"] % len(ISOCHRONE_COLORS)]
+        return {"color": color, "weight": 0, "fillColor": color, "fillOpacity": 0.25}
+
+    return folium.GeoJson(
+        collection,
+        name="Travel time",
+        style_function=style,
+        control=False,
+        interactive=False,
+    )
+
+
+def initial_box(center: tuple[float, float] = DEFAULT_CENTER) -> tuple[float, float, float, float]:
+    """(south, west, north, east) of the view opened at center and ZOOM_START."""
+    lat, lon = center
+    return (lat - INITIAL_SPAN_DEG[0], lon - INITIAL_SPAN_DEG[1],
+            lat + INITIAL_SPAN_DEG[0], lon + INITIAL_SPAN_DEG[1])
+
+
+def bounds_box(bounds: dict | None) -> tuple[float, float, float, float] | None:
+    """(south, west, north, east) from st_folium bounds; None if not known yet."""
+    try:
+        box = (
+            bounds["_southWest"]["lat"], bounds["_southWest"]["lng"],
+            bounds["_northEast"]["lat"], bounds["_northEast"]["lng"],
+        )
+    except (TypeError, KeyError):
+        return None
+    return None if None in box else box
+
+
+def visible_schools(index, df, box: tuple[float, float, float, float] | None,
+                    pad: float = 0.1) -> list[dict]:
+    """Map records (see map_records) of the rows of `df` inside a (south, west,
+    north, east) box from bounds_box, padded by a fraction of the box size.
+
+    Until the map has reported its bounds (box is None, first render), the
+    view it opens at: DEFAULT_CENTER at ZOOM_START (see initial_box).
+    """
+    south, west, north, east = box or initial_box()
+    dlat, dlon = (north - south) * pad, (east - west) * pad
+    ids = index.in_bounds(south - dlat, west - dlon, north + dlat, east + dlon)
+    return map_records(df[df["id"].isin(ids)])
+
+
+def create_map(schools, mode: str = "markers", highlight=frozenset(), isochrones: dict | None = None) -> folium.Map:
+    """Build the folium map in the requested rendering mode.
+
+    In "viewport" mode only the base map is returned, centered on
+    DEFAULT_CENTER (the view visible_schools assumes before the map reports its
+    bounds); the visible markers are added by the caller as a dynamic layer.
+    Isochrones (a FeatureCollection
+    from travel_time.RoadGraph.isochrones) are drawn below the markers.
+    """
+    if mode not in MAP_MODES:
+        raise ValueError(f"Unknown map mode {mode!r}; expected one of {MAP_MODES}")
+    m = base_map(DEFAULT_CENTER if mode == "viewport" else map_center(schools))
+    if isochrones:
+        isochrone_layer(isochrones).add_to(m)
+    if mode == "markers":
+        add_markers(m, schools, highlight)
+    elif mode == "cluster":
+        cluster_layer(schools, highlight).add_to(m)
+    elif mode == "geojson":
+        geojson_layer(schools, highlight).add_to(m)
+    return m
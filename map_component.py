@@ -0,0 +1,190 @@
+"""
+map_component.py
+Cacheable front end for the streamlit_folium component.
+
+st_folium() re-renders and re-serializes the whole folium map on every call,
+so even a rerun triggered by a pin click rebuilds megabytes of JS. Here that
+work is split in two:
+
+- serialize_map() turns a folium.Map into the payload st_folium would send
+  (leaflet script, header, html, asset links, default return values). The app
+  caches this with st.cache_resource, so it is built once per dataset version,
+  map mode and filter state and shared by all sessions.
+- render_map() sends a payload to the st_folium frontend without touching
+  folium again.
+
+This mirrors streamlit_folium.st_folium (0.27) and reuses its private
+helpers, which is why requirements.txt pins streamlit-folium to that release.
+If they cannot be imported (another release), the payload keeps the folium
+map itself and render_map() falls back to plain st_folium(): slower, since
+the map is serialized on every rerun again, but working. st_folium adds a
+dynamic layer to the map it is given, so with one the fallback passes it
+copies of the (cached, shared) map and layer.
+"""
+
+from __future__ import annotations
+
+import copy
+
+import branca
+import folium
+import folium.elements
+from streamlit_folium import st_folium
+
+try:
+    from streamlit_folium import (
+        _component_func,
+        _get_feature_group_string,
+        _get_header,
+        _get_html,
+        _get_map_string,
+        generate_js_hash,
+        get_full_id,
+    )
+except ImportError:  # helpers moved or renamed upstream: use st_folium itself
+    _component_func = None
+
+
+def _bounds_to_dict(bounds_list):
+    southwest, northeast = bounds_list
+    return {
+        "_southWest": {"lat": southwest[0], "lng": southwest[1]},
+        "_northEast": {"lat": northeast[0], "lng": northeast[1]},
+    }
+
+
+def _map_bounds(folium_map):
+    try:
+        bounds = folium_map.get_bounds()
+    except AttributeError:
+        bounds = [[None, None], [None, None]]
+    return _bounds_to_dict(bounds)
+
+
+def _asset_links(folium_map):
+    """CSS and JS links needed by the map and its children, deduplicated."""
+    def walk(fig):
+        if isinstance(fig, branca.colormap.ColorMap):
+            yield fig
+        if isinstance(fig, folium.elements.JSCSSMixin):
+            yield fig
+        if hasattr(fig, "_children"):
+            for child in fig._children.values():
+                yield from walk(child)
+
+    css_links, js_links = [], []
+    for elem in walk(folium_map):
+        if isinstance(elem, branca.colormap.ColorMap):
+            js_links.insert(0, "https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js")
+            js_links.insert(0, "https://d3js.org/d3.v4.min.js")
+        css_links.extend([href for _, href in getattr(elem, "default_css", [])])
+        js_links.extend([src for _, src in getattr(elem, "default_js", [])])
+    return list(dict.fromkeys(css_links)), list(dict.fromkeys(js_links))
+
+
+def serialize_map(folium_map: folium.Map) -> dict:
+    """Render a folium map once into the st_folium component payload."""
+    if _component_func is None:
+        return _unserialized(folium_map)
+    folium_map.get_root().render()
+    folium_map.render()
+
+    # _get_html/_get_header must run before _get_map_string, which alters
+    # the folium structure
+    html = _get_html(folium_map)
+    header = _get_header(folium_map)
+    script = _get_map_string(folium_map)
+    css_links, js_links = _asset_links(folium_map)
+
+    return {
+        "script": script,
+        "header": header,
+        "html": html,
+        "id": get_full_id(folium_map),
+        "css_links": css_links,
+        "js_links": js_links,
+        "bounds": _map_bounds(folium_map),
+        "zoom": folium_map.options.get("zoom"),
+        # Component key; hashing the script is itself costly on large maps
+        "js_hash": generate_js_hash(script, None, False),
+    }
+
+
+def _unserialized(folium_map: folium.Map) -> dict:
+    """Fallback payload: the map itself, rendered by st_folium on every call."""
+    return {
+        "map": folium_map,
+        "bounds": _map_bounds(folium_map),
+        "zoom": folium_map.options.get("zoom"),
+    }
+
+
+def feature_group_script(feature_group: folium.FeatureGroup) -> str | folium.FeatureGroup:
+    """Serialize a dynamic layer for render_map(feature_group=...)."""
+    if _component_func is None:
+        return feature_group  # render_map copies it before st_folium adds it to a map
+    # The layer is attached to a throwaway map so the cached one is never mutated
+    return _get_feature_group_string(feature_group, map=folium.Map(tiles=None), idx=0)
+
+
+def render_map(
+    payload: dict,
+    height: int = 700,
+    width: int | None = None,
+    returned_objects: list[str] | None = None,
+    feature_group: str | folium.FeatureGroup | None = None,
+    center: tuple[float, float] | None = None,
+    zoom: int | None = None,
+    key: str | None = None,
+):
+    """Send a serialized map to the st_folium frontend and return its state."""
+    if "map" in payload:
+        folium_map = payload["map"]
+        if feature_group is not None:
+            # Never let st_folium attach the layer to the shared map
+            folium_map, feature_group = copy.deepcopy((folium_map, feature_group))
+        return st_folium(
+            folium_map, key=key, height=height, width=width, returned_objects=returned_objects,
+            zoom=zoom, center=center, feature_group_to_add=feature_group,
+            use_container_width=width is None,
+        )
+    defaults = {
+        "last_clicked": None,
+        "last_object_clicked": None,
+        "last_object_clicked_count": None,
+        "last_object_clicked_tooltip": None,
+        "last_object_clicked_popup": None,
+        "all_drawings": None,
+        "last_active_drawing": None,
+        "bounds": payload["bounds"],
+        "zoom": payload["zoom"],
+        "last_circle_radius": None,
+        "last_circle_polygon": None,
+        "selected_layers": None,
+        "selected_tags": None,
+        "last_geocoder_result": None,
+    }
+    if returned_objects is not None:
+        defaults = {k: v for k, v in defaults.items() if k in returned_objects}
+
+    return _component_func(
+        script=payload["script"],
+        header=payload["header"],
+        html=payload["html"],
+        id=payload["id"],
+        key=payload["js_hash"] if key is None else generate_js_hash(payload["script"], key, False),
+        height=height,
+        width=width,
+        returned_objects=returned_objects,
+        default=defaults,
+        zoom=zoom,
+        center=center,
+        feature_group=feature_group,
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=payload["css_links"],
+        js_links=payload["js_links"],
+        on_change=None,
+        wrap_longitude=False,
+    )
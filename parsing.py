@@ -0,0 +1,123 @@
+"""
+parsing.py
+Extract numeric columns from the free-text rating, review, size and fee fields.
+
+Values such as "3.9 (listed under ...)", "50+", "~700–800 students" or
+"€831/month ...; Admission fee: €2,100" are parsed once when the dataset is
+typed (dataset.apply_schema), so the results are stored in the Parquet
+sidecar / snapshot and sorting and filtering can run on plain columns.
+
+Every extracted column comes with a confidence flag:
+- "exact":       a single figure with no hedging
+- "approximate": a range (midpoint used), a lower bound ("50+"), "~",
+                 "estimated"/"approximate", or a value derived by conversion
+- "missing":     no usable figure in the text
+"""
+
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+
+CONFIDENCE = pd.CategoricalDtype(["exact", "approximate", "missing"])
+
+# Monthly fees are converted to annual ones (and back) assuming the usual
+# 10 instalments per school year
+INSTALMENTS_PER_YEAR = 10
+
+NUMBER = r"\d[\d,]*(?:\.\d+)?"
+RANGE = rf"({NUMBER})(?:\s*[–-]\s*€?\s*({NUMBER}))?"
+HEDGE = r"~|\+|\d\s*[–-]\s*€?\s*\d|approx|estimat"
+
+RATING = r"(?<![\d.])([0-5](?:\.\d+)?)(?:\s*[–-]\s*([0-5](?:\.\d+)?))?"
+COUNT_TOTAL = r"=\s*(\d+)"
+STUDENTS_LEAD = rf"^\s*~?{RANGE}"
+STUDENTS_CONTEXT = rf"~?{RANGE}\+?\s*(?:students|pupils|alumn)"
+FEE = rf"([~<>])?\s*€\s*{RANGE}\s*/\s*(month|year|yr)\b"
+FREE = r"^\s*(?:free|gratis)\b|no tuition"
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """String view with thousands separators removed ("2,100" -> "2100")."""
+    return series.astype("string").str.replace(r"(?<=\d),(?=\d{3}\b)", "", regex=True)
+
+
+def _midpoint(lo: pd.Series, hi: pd.Series) -> pd.Series:
+    lo = pd.to_numeric(lo, errors="coerce")
+    hi = pd.to_numeric(hi, errors="coerce")
+    return ((lo + hi.fillna(lo)) / 2).astype("float32")
+
+
+def _confidence(value: pd.Series, approximate: pd.Series) -> pd.Series:
+    flag = np.where(value.isna(), "missing", np.where(approximate, "approximate", "exact"))
+    return pd.Series(flag, index=value.index).astype(CONFIDENCE)
+
+
+def _hedged(text: pd.Series) -> pd.Series:
+    return text.str.contains(HEDGE, case=False, regex=True).fillna(False).astype(bool)
+
+
+def parse_rating(series: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Star rating on a 0-5 scale; ranges are averaged."""
+    text = _text(series)
+    found = text.str.extract(RATING)
+    value = _midpoint(found[0], found[1])
+    return value, _confidence(value, _hedged(text))
+
+
+def parse_count(series: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Review count; an explicit "= N total" wins over the first figure."""
+    text = _text(series)
+    total = pd.to_numeric(text.str.extract(COUNT_TOTAL)[0], errors="coerce")
+    found = text.str.extract(rf"{RANGE}")
+    value = total.fillna(_midpoint(found[0], found[1])).astype("float32")
+    return value, _confidence(value, _hedged(text))
+
+
+def parse_students(series: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Student count: a leading figure, or one followed by "students"/"pupils"."""
+    text = _text(series)
+    lead = text.str.extract(STUDENTS_LEAD)
+    context = text.str.extract(STUDENTS_CONTEXT, flags=re.IGNORECASE)
+    value = _midpoint(lead[0], lead[1]).fillna(_midpoint(context[0], context[1]))
+    return value, _confidence(value, _hedged(text))
+
+
+def parse_fees(series: pd.Series) -> tuple[pd.Series, pd.Series, pd.Series, pd.Series]:
+    """Headline tuition as (monthly, monthly_conf, annual, annual_conf) in EUR.
+
+    The first "€X/month" or "€X/year" figure is taken as the headline price;
+    schools listed as free get 0 even if extras (canteen, AFA) are priced.
+    """
+    text = _text(series)
+    found = text.str.extract(FEE, flags=re.IGNORECASE)
+    amount = _midpoint(found[1], found[2])
+    per_month = found[3].str.lower().eq("month").fillna(False).astype(bool)
+    hedged = found[0].notna() | found[2].notna()
+
+    free = text.str.contains(FREE, case=False, regex=True).fillna(False).astype(bool)
+    monthly = amount.where(per_month, amount / INSTALMENTS_PER_YEAR).mask(free, 0).astype("float32")
+    annual = amount.where(~per_month, amount * INSTALMENTS_PER_YEAR).mask(free, 0).astype("float32")
+    return (
+        monthly, _confidence(monthly, hedged | (~per_month & ~free)),
+        annual, _confidence(annual, hedged | (per_month & ~free)),
+    )
+
+
+def add_parsed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Add numeric *_value/*_count/fee_* columns and their *_conf flags in place."""
+    def column(name):
+        if name in df:
+            return df[name]
+        return pd.Series(pd.NA, index=df.index, dtype="string")
+
+    for source in ("micole_rating", "google_rating"):
+        df[f"{source}_value"], df[f"{source}_conf"] = parse_rating(column(source))
+    for source in ("micole_reviews", "google_reviews"):
+        df[f"{source}_count"], df[f"{source}_conf"] = parse_count(column(source))
+    df["student_count_value"], df["student_count_conf"] = parse_students(column("student_count"))
+    (df["fee_monthly_eur"], df["fee_monthly_conf"],
+     df["fee_annual_eur"], df["fee_annual_conf"]) = parse_fees(column("fees_range"))
+    return df
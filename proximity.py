@@ -0,0 +1,132 @@
+"""
+proximity.py
+"Near my home" search: which schools are within X km of a point, nearest first.
+
+Distances are great-circle (haversine) distances computed over NumPy lat/lon
+arrays taken from the loaded dataset, never in a Python loop. For large
+datasets a ball tree over unit-sphere coordinates prunes the candidates
+before the exact haversine pass.
+"""
+
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Below this size a full vectorized pass beats walking the tree
+BALLTREE_MIN_SIZE = 5000
+LEAF_SIZE = 64
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distance in km from one point to arrays of points."""
+    p1, p2 = np.radians(lat), np.radians(lats)
+    dlat = p2 - p1
+    dlon = np.radians(lons) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    phi, lam = np.radians(lats), np.radians(lons)
+    return np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+
+
+class BallTree:
+    """Ball tree over points on the unit sphere, queried by chord distance."""
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.xyz = _unit_vectors(lats, lons)
+        self.leaf_size = leaf_size
+        # Flat node arrays: center, radius, children (or -1) and leaf slices
+        self.centers, self.radii, self.children, self.leaves = [], [], [], []
+        self._build(np.arange(len(self.xyz)))
+
+    def _build(self, idx: np.ndarray) -> int:
+        node = len(self.centers)
+        pts = self.xyz[idx]
+        center = pts.mean(axis=0)
+        self.centers.append(center)
+        self.radii.append(float(np.sqrt(((pts - center) ** 2).sum(axis=1).max())) if len(idx) else 0.0)
+        self.children.append((-1, -1))
+        self.leaves.append(None)
+        if len(idx) <= self.leaf_size:
+            self.leaves[node] = idx
+            return node
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        mid = len(idx) // 2
+        order = np.argpartition(pts[:, axis], mid)
+        left = self._build(idx[order[:mid]])
+        right = self._build(idx[order[mid:]])
+        self.children[node] = (left, right)
+        return node
+
+    def candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Indices of all points possibly within radius_km (a superset)."""
+        q = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+        chord = 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+        found, stack = [], [0]
+        while stack:
+            node = stack.pop()
+            if np.linalg.norm(q - self.centers[node]) - self.radii[node] > chord:
+                continue
+            if self.leaves[node] is not None:
+                found.append(self.leaves[node])
+            else:
+                stack.extend(self.children[node])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+
+class ProximityIndex:
+    """Coordinate arrays for the dataset rows, with an optional ball tree."""
+
+    def __init__(self, lats, lons):
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        self.valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        self.lats, self.lons = lats[self.valid], lons[self.valid]
+        self.tree = BallTree(self.lats, self.lons) if len(self.valid) >= BALLTREE_MIN_SIZE else None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> ProximityIndex:
+        return cls(df["lat"].to_numpy(dtype="float64", na_value=np.nan),
+                   df["lon"].to_numpy(dtype="float64", na_value=np.nan))
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """(row positions, distances in km) within radius_km, nearest first."""
+        if self.tree is not None:
+            cand = self.tree.candidates(lat, lon, radius_km)
+        else:
+            cand = np.arange(len(self.valid))
+        dist = haversine_km(lat, lon, self.lats[cand], self.lons[cand])
+        keep = dist <= radius_km
+        cand, dist = cand[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return self.valid[cand[order]], dist[order]
+
+
+def parse_lat_lon(text: str) -> tuple[float, float] | None:
+    """Parse "39.47, -0.37" style input; None if the text is not a coordinate pair."""
+    m = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*[,;\s]\s*(-?\d+(?:\.\d+)?)\s*", text or "")
+    if not m:
+        return None
+    lat, lon = float(m.group(1)), float(m.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def nearby_table(df: pd.DataFrame, positions: np.ndarray, distances: np.ndarray) -> pd.DataFrame:
+    """Distance-sorted display table for the rows at the given positions."""
+    rows = df.iloc[positions]
+    return pd.DataFrame({
+        "Distance (km)": np.round(distances, 2),
+        "School": rows["name"].astype("string").to_numpy(),
+        "Type": rows["type"].astype("string").to_numpy(),
+        "Municipality": rows["municipality"].astype("string").to_numpy(),
+        "id": rows["id"].astype("string").to_numpy(),
+    })
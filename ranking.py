@@ -0,0 +1,132 @@
+"""
+ranking.py
+Composite school ranking across rating sources, weighted by review counts.
+
+A raw rating says little on its own: a 5.0 from 2 reviews should not beat a
+4.5 from 200. The composite score is a Bayesian average that pools the
+reviews of every source,
+
+    score = (sum_s w_s * n_s * r_s + m * C) / (sum_s w_s * n_s + m)
+
+where r_s and n_s are a school's rating and review count on source s, w_s the
+configurable source weight, C the review-weighted mean rating over the whole
+dataset and m the prior strength (in reviews). Schools with few reviews are
+pulled towards C; a rating without a parsed review count counts as one
+review. Schools with no rating at all get no score and rank last.
+
+C is taken over the frame being scored unless per-source totals are passed
+(rating_totals); a sharded dataset passes the totals its manifest recorded
+over every shard, so scores do not shift as regions are loaded.
+
+Scores are computed for every row at once as column operations and cached
+per dataset version and weights; top_k() then picks the best rows of a
+filter selection with a partial sort (np.partition) and orders only those.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# source -> (rating column, review count column), as added by parsing.py
+RATING_SOURCES = {
+    "micole": ("micole_rating_value", "micole_reviews_count"),
+    "google": ("google_rating_value", "google_reviews_count"),
+}
+
+DEFAULT_WEIGHTS = {"micole": 1.0, "google": 1.0}
+
+# Prior strength: a school needs about this many reviews before its own
+# ratings outweigh the dataset mean
+DEFAULT_PRIOR_REVIEWS = 25.0
+
+
+def weights_key(weights: dict[str, float]) -> tuple[tuple[str, float], ...]:
+    """Hashable, order-independent form of a weights dict (for cache keys)."""
+    return tuple(sorted(weights.items()))
+
+
+def _source_reviews(df: pd.DataFrame, source: str) -> tuple[np.ndarray, np.ndarray]:
+    """(rating, review count) per row for one source; unrated rows count 0 reviews."""
+    rating_col, count_col = RATING_SOURCES[source]
+    if rating_col not in df:
+        return np.zeros(len(df)), np.zeros(len(df))
+    rating = df[rating_col].to_numpy(dtype="float64", na_value=np.nan)
+    count = (
+        df[count_col].to_numpy(dtype="float64", na_value=np.nan)
+        if count_col in df else np.full(len(df), np.nan)
+    )
+    rated = ~np.isnan(rating)
+    count = np.where(rated, np.fmax(np.nan_to_num(count, nan=1.0), 1.0), 0.0)
+    return np.where(rated, rating, 0.0), count
+
+
+def rating_totals(df: pd.DataFrame) -> dict[str, list[float]]:
+    """Per source [sum of count * rating, sum of counts] over the frame (JSON-ready)."""
+    totals = {}
+    for source in RATING_SOURCES:
+        rating, count = _source_reviews(df, source)
+        totals[source] = [float((count * rating).sum()), float(count.sum())]
+    return totals
+
+
+def composite_scores(df: pd.DataFrame, weights: dict[str, float] | None = None,
+                     prior_reviews: float = DEFAULT_PRIOR_REVIEWS,
+                     totals: dict[str, list[float]] | None = None) -> np.ndarray:
+    """Composite score per row (float64, NaN for schools with no rating).
+
+    The prior mean comes from `totals` (see rating_totals) when given, else
+    from the frame itself.
+    """
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    weighted_sum = np.zeros(len(df))
+    weighted_reviews = np.zeros(len(df))
+    for source in RATING_SOURCES:
+        weight = weights.get(source, 0.0)
+        if not weight:
+            continue
+        rating, count = _source_reviews(df, source)
+        weighted_sum += weight * count * rating
+        weighted_reviews += weight * count
+
+    rated = weighted_reviews > 0
+    if not rated.any():
+        return np.full(len(df), np.nan)
+    if totals:
+        pooled = [(weights.get(s, 0.0) * t[0], weights.get(s, 0.0) * t[1]) for s, t in totals.items()]
+        prior_mean = sum(p[0] for p in pooled) / max(sum(p[1] for p in pooled), 1e-12)
+    else:
+        prior_mean = weighted_sum.sum() / weighted_reviews.sum()
+    scores = (weighted_sum + prior_reviews * prior_mean) / (weighted_reviews + prior_reviews)
+    return np.where(rated, scores, np.nan)
+
+
+class Ranking:
+    """Composite scores for one dataset frame and weight setting."""
+
+    def __init__(self, df: pd.DataFrame, weights: dict[str, float] | None = None,
+                 prior_reviews: float = DEFAULT_PRIOR_REVIEWS,
+                 totals: dict[str, list[float]] | None = None):
+        self.scores = composite_scores(df, weights, prior_reviews, totals)
+        # NaN sorts last; ties keep dataset order
+        self._keys = np.where(np.isnan(self.scores), -np.inf, self.scores)
+
+    def top_k(self, positions: np.ndarray | None = None, k: int | None = None) -> np.ndarray:
+        """Row positions of the k best-scored rows among `positions`, best first.
+
+        Only the k winners are sorted, so picking the top 100 of 100k rows is
+        linear; k=None (or k >= len(positions)) orders the whole selection.
+        """
+        positions = np.arange(len(self.scores)) if positions is None else np.asarray(positions)
+        keys = self._keys[positions]
+        if k is not None and k < len(positions):
+            if k <= 0:
+                return positions[:0]
+            # k-th best key by partial sort; rows tied at the cut are taken in
+            # dataset order so the result does not depend on partition order
+            cut = -np.partition(-keys, k - 1)[k - 1]
+            above = np.flatnonzero(keys > cut)
+            tied = np.flatnonzero(keys == cut)[: k - len(above)]
+            chosen = np.concatenate([above, tied])
+            positions, keys = positions[chosen], keys[chosen]
+        return positions[np.lexsort((positions, -keys))]
@@ -0,0 +1,154 @@
+"""
+rerun_metrics.py
+Optional timing spans and memory samples for one run of schoolapp.py.
+
+Disabled unless asked for, and then span() returns a shared no-op context
+manager, so the instrumented stages cost one attribute check each. Enable
+with either:
+
+- SCHOOLAPP_DEBUG=1 (or ?debug=1 in the page URL): timings overlay in the
+  sidebar
+- SCHOOLAPP_METRICS_FILE=path: every finished rerun is exported; a path
+  ending in .prom is rewritten as a Prometheus text-format file (cumulative
+  per-stage summaries, for the node_exporter textfile collector), anything
+  else gets one JSON line appended per rerun
+
+Memory is the current RSS from /proc/self/statm (Linux; no tracing
+overhead), read when each span starts and ends: rss_delta_kb is what the
+stage added to the process (negative when it freed more than it allocated)
+and rss_kb where it ended. Sessions rerunning concurrently share the
+process, so their spans can see each other's allocations. Elsewhere both
+are None.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+OVERLAY_ENV = "SCHOOLAPP_DEBUG"
+EXPORT_ENV = "SCHOOLAPP_METRICS_FILE"
+
+_NULL_SPAN = nullcontext()
+
+# Cumulative Prometheus series, shared by all sessions in the process
+_LOCK = threading.Lock()
+_STAGE_TOTALS: dict[str, list[float]] = {}  # stage -> [count, seconds]
+_RERUNS = [0, 0.0]
+
+
+def rss_kb() -> int | None:
+    """Current resident set size of this process in KiB (None if unavailable)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):  # not Linux
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _delta(start: int | None, end: int | None) -> int | None:
+    return None if start is None or end is None else end - start
+
+
+class RerunMetrics:
+    """Collects (stage, duration, RSS change) spans for a single rerun."""
+
+    def __init__(self, enabled: bool = False, overlay: bool = False, export_path: str | None = None):
+        self.enabled = enabled or overlay or bool(export_path)
+        self.overlay = overlay
+        self.export_path = export_path
+        self.spans: list[dict] = []
+        self._start = time.perf_counter() if self.enabled else 0.0
+        self._start_rss = rss_kb() if self.enabled else None
+
+    @classmethod
+    def from_env(cls, overlay: bool = False) -> RerunMetrics:
+        return cls(
+            overlay=overlay or os.environ.get(OVERLAY_ENV, "") not in ("", "0"),
+            export_path=os.environ.get(EXPORT_ENV) or None,
+        )
+
+    def span(self, stage: str):
+        """Context manager timing one stage; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(stage)
+
+    @contextmanager
+    def _span(self, stage: str):
+        start, start_rss = time.perf_counter(), rss_kb()
+        try:
+            yield
+        finally:
+            end_rss = rss_kb()
+            self.spans.append({
+                "stage": stage,
+                "start_ms": round((start - self._start) * 1000, 3),
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+                "rss_delta_kb": _delta(start_rss, end_rss),
+                "rss_kb": end_rss,
+            })
+
+    def finish(self) -> dict | None:
+        """Close the rerun and export it; returns the record (None when disabled)."""
+        if not self.enabled:
+            return None
+        end_rss = rss_kb()
+        record = {
+            "ts": time.time(),
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "rss_delta_kb": _delta(self._start_rss, end_rss),
+            "rss_kb": end_rss,
+            "spans": self.spans,
+        }
+        if self.export_path:
+            if self.export_path.endswith(".prom"):
+                write_prometheus(record, self.export_path)
+            else:
+                append_jsonl(record, self.export_path)
+        return record
+
+
+def append_jsonl(record: dict, path: str) -> None:
+    line = json.dumps(record, ensure_ascii=False)
+    with _LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def write_prometheus(record: dict, path: str) -> None:
+    """Fold a rerun into the cumulative series and rewrite the text file atomically."""
+    with _LOCK:
+        _RERUNS[0] += 1
+        _RERUNS[1] += record["total_ms"] / 1000
+        for span in record["spans"]:
+            totals = _STAGE_TOTALS.setdefault(span["stage"], [0, 0.0])
+            totals[0] += 1
+            totals[1] += span["ms"] / 1000
+
+        lines = [
+            "# HELP schoolapp_stage_seconds Time spent in each rerun stage.",
+            "# TYPE schoolapp_stage_seconds summary",
+        ]
+        for stage, (count, seconds) in sorted(_STAGE_TOTALS.items()):
+            lines.append(f'schoolapp_stage_seconds_sum{{stage="{stage}"}} {seconds:.6f}')
+            lines.append(f'schoolapp_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines += [
+            "# HELP schoolapp_rerun_seconds Total script rerun time.",
+            "# TYPE schoolapp_rerun_seconds summary",
+            f"schoolapp_rerun_seconds_sum {_RERUNS[1]:.6f}",
+            f"schoolapp_rerun_seconds_count {_RERUNS[0]}",
+        ]
+        if record["rss_kb"] is not None:
+            lines += [
+                "# HELP schoolapp_rss_bytes Resident set size of the server process after the last rerun.",
+                "# TYPE schoolapp_rss_bytes gauge",
+                f"schoolapp_rss_bytes {record['rss_kb'] * 1024}",
+            ]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
@@ -1,7 +1,10 @@
+import json
+from functools import partial
+
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import st_folium
+
+from detail_panel import PANEL_CSS, render_detail_html
+from rerun_metrics import RerunMetrics
 
 # Page config
 st.set_page_config(
@@ -20,360 +23,633 @@ st.markdown("""
         color: #1f77b4;
         font-weight: 600;
     }
-    .school-header {
-        color: #2c3e50;
-        font-size: 1.8rem;
-        font-weight: 600;
-        margin-bottom: 0.5rem;
-    }
-    .school-type {
-        color: #7f8c8d;
-        font-size: 1.1rem;
-        margin-bottom: 1rem;
-    }
-    .info-label {
-        color: #34495e;
-        font-weight: 600;
-        margin-top: 0.8rem;
-    }
-    .info-value {
-        color: #555;
-        margin-bottom: 0.5rem;
-    }
+    """ + PANEL_CSS + """
     </style>
 """, unsafe_allow_html=True)
 
-# Load schools data from CSV
-@st.cache_data
-def load_schools():
-    """Load schools from CSV file and convert to list of dictionaries"""
-    # Read CSV and drop any completely empty columns
-    df = pd.read_csv('school_data.csv')
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]  # Remove unnamed columns
-    
-    # Convert NaN to None for cleaner handling
-    df = df.where(pd.notnull(df), None)
-    
-    # Convert to records
-    schools = df.to_dict('records')
-    
-    # Clean up any remaining issues
-    for school in schools:
-        # Ensure numeric fields are properly typed
-        if school.get('lat'):
-            try:
-                school['lat'] = float(school['lat'])
-            except (ValueError, TypeError):
-                school['lat'] = None
-        if school.get('lon'):
-            try:
-                school['lon'] = float(school['lon'])
-            except (ValueError, TypeError):
-                school['lon'] = None
-        if school.get('founded'):
-            try:
-                school['founded'] = int(school['founded'])
-            except (ValueError, TypeError):
-                school['founded'] = None
-    
-    return schools
+# Per-rerun timing spans; a no-op unless SCHOOLAPP_DEBUG, ?debug=1 or
+# SCHOOLAPP_METRICS_FILE asks for them (see rerun_metrics.py)
+METRICS = RerunMetrics.from_env(overlay=st.query_params.get("debug") == "1")
 
-SCHOOLS = load_schools()
+# Page shell first: a cold worker otherwise shows a blank page while it
+# imports pandas, pyarrow, folium and streamlit_folium and loads the data.
+# Elements are streamed to the browser as the script runs, so the title and
+# layout appear before any of that work starts
+with METRICS.span("shell"):
+    col1, col2 = st.columns([2, 1], gap="large")
+    with col1:
+        st.title("🎓 Valencia Schools Explorer")
+        st.markdown("**Click any pin on the map to see school details**")
+    with col2:
+        st.markdown("### 📋 School Information")
 
-# Initialize session state
-if "selected_school" not in st.session_state:
-    st.session_state.selected_school = None
+# Heavy modules are imported after the shell, not on first use: the first
+# render needs all of them. Later reruns find them in sys.modules. Only
+# geocoding imports its module when used
+with METRICS.span("imports"):
+    import numpy as np
+    import pandas as pd
 
-# Create the map
-def create_map():
-    # Calculate center of all schools with valid coordinates
-    valid_schools = [s for s in SCHOOLS if s.get('lat') and s.get('lon')]
-    
-    if not valid_schools:
-        # Default to Valencia center if no valid coordinates
-        center_lat, center_lon = 39.4699, -0.3763
+    from comparison import MAX_COMPARE, comparison_table, id_index, row_positions
+    from facets import FACET_LABELS, FacetIndex, selection_key
+    from live_data import LiveDataset
+    from map_builder import (
+        DEFAULT_CENTER, bounds_box, create_map, map_records, marker_layer, tooltip_school_id, visible_schools
+    )
+    from map_component import feature_group_script, render_map, serialize_map
+    from proximity import ProximityIndex, nearby_table, parse_lat_lon
+    from ranking import DEFAULT_PRIOR_REVIEWS, DEFAULT_WEIGHTS, Ranking, weights_key
+    from shards import ShardManifest, refresh_stale_shards
+    from spatial_index import SpatialIndex
+    from table_builder import build_table, highlight_rows, patch_table
+    from text_search import SearchIndex
+    from travel_time import ISOCHRONE_MINUTES, PROFILE_LABELS, ROAD_GRAPH_FILE, RoadGraph, graph_version
+
+# Load schools data (compiled snapshot, or the typed CSV as a fallback). One
+# read-only snapshot is shared by all sessions; when the files change it is
+# reloaded and diffed by id, and each cached artifact below is keyed by the
+# version at which its own input columns last changed (see live_data.py).
+# Facets, search and the table are built through DATA.derive, which patches
+# just the edited rows when schools were only edited in place.
+# When shards/manifest.json exists (python shards.py), only the region shards
+# around the current map bounds are loaded, one dataset per set of shards;
+# shards built from an older version of the data are rebuilt first
+SHARDS = ShardManifest.load()
+if SHARDS is not None:
+    SHARDS = refresh_stale_shards(SHARDS)
+
+if "map_bounds" not in st.session_state:
+    st.session_state.map_bounds = None
+
+if "map_zoom" not in st.session_state:
+    st.session_state.map_zoom = None
+
+@st.cache_resource(max_entries=8)
+def live_dataset(_shards=None, shard_files=None, rating_totals=None):
+    """Process-wide dataset (or set of region shards), reloaded incrementally;
+    sharded, one per set of dataset-wide rating totals, which every score
+    depends on (see get_ranking)"""
+    if _shards is None:
+        return LiveDataset()
+    return LiveDataset(
+        loader=partial(_shards.load_frame, shard_files),
+        version_fn=partial(_shards.version, shard_files),
+    )
+
+with METRICS.span("load"):
+    if SHARDS is None:
+        SHARD_FILES = None
+        DATA = live_dataset().refresh()
     else:
-        lats = [float(s["lat"]) for s in valid_schools]
-        lons = [float(s["lon"]) for s in valid_schools]
-        center_lat = sum(lats) / len(lats)
-        center_lon = sum(lons) / len(lons)
-    
-    # Create map with minimal black and white style
-    m = folium.Map(
-        location=[center_lat, center_lon],
-        zoom_start=11,
-        tiles="https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
-        attr='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>',
-        control_scale=True
+        SHARD_FILES = SHARDS.files_for_bounds(bounds_box(st.session_state.map_bounds), center=DEFAULT_CENTER)
+        DATA = live_dataset(SHARDS, SHARD_FILES, json.dumps(SHARDS.rating_totals, sort_keys=True)).refresh()
+# Records are converted from the frame per school on first lookup; anything
+# that covers every school reads the frame's columns instead
+SCHOOLS_BY_ID = DATA.by_id
+
+# Build the click-resolution index once per change of the coordinates
+@st.cache_resource(max_entries=2)
+def build_spatial_index(_data, key):
+    """KD-tree over school coordinates"""
+    return SpatialIndex.from_frame(_data.frame)
+
+with METRICS.span("spatial_index"):
+    SPATIAL_INDEX = build_spatial_index(DATA, DATA.key("spatial"))
+
+def resolve_clicked_school(clicked, tooltip=None):
+    """Map a clicked marker back to its school id"""
+    # Every school marker's tooltip carries its id, so pins sharing a position
+    # are told apart exactly
+    school_id = tooltip_school_id(tooltip)
+    if school_id in SCHOOLS_BY_ID:
+        return school_id
+    # Otherwise the school nearest to the clicked position
+    hits = SPATIAL_INDEX.nearest(clicked["lat"], clicked["lng"], k=1)
+    if not hits or hits[0][0] > 0.1:  # nothing within 100 m of the click
+        return None
+    return hits[0][1]
+
+# Detail panel HTML, rendered once per school and version of that school's row
+@st.cache_data(max_entries=1024)
+def get_detail_html(_data, row_version, school_id):
+    """Pre-rendered "School Information" panel for one school"""
+    return render_detail_html(_data.by_id[school_id])
+
+# Initialize session state; sessions hold only the selected id and read the
+# record from the shared dataset
+if "selected_school_id" not in st.session_state:
+    st.session_state.selected_school_id = None
+
+# Schools picked for the side-by-side comparison (ids, in the order added);
+# ids that are no longer loaded (data reload, other shards) are dropped
+st.session_state.compare_ids = [
+    i for i in st.session_state.get("compare_ids", []) if i in SCHOOLS_BY_ID
+][:MAX_COMPARE]
+
+def add_to_comparison(school_id):
+    if school_id not in st.session_state.compare_ids and len(st.session_state.compare_ids) < MAX_COMPARE:
+        st.session_state.compare_ids = st.session_state.compare_ids + [school_id]
+
+# Facet filters: bitmaps per facet value, built once per change of their columns
+@st.cache_resource(max_entries=2)
+def get_facet_index(_data, key):
+    """Bitmap index over type, municipality, language, curriculum and age band"""
+    return _data.derive("facets", ("facets",), FacetIndex, FacetIndex.patched)
+
+@st.cache_resource(max_entries=64)
+def filtered_rows(_data, key, filter_key=None):
+    """Row positions and ids of the schools matching a facet selection"""
+    index = get_facet_index(_data, key)
+    positions = index.positions(index.mask(dict(filter_key or ())))
+    ids = frozenset(_data.frame["id"].iloc[positions])
+    return positions, ids
+
+with METRICS.span("facets"):
+    FACET_INDEX = get_facet_index(DATA, DATA.key("facets"))
+
+    st.sidebar.markdown("### 🔎 Filter Schools")
+    if SHARDS is not None:
+        st.sidebar.caption("Counts cover the schools in the map regions loaded so far")
+    # Counts reflect the selections in the other facets; widget state is already
+    # updated when the script reruns, so it can be read before drawing the widgets
+    facet_counts = FACET_INDEX.counts(
+        {f: st.session_state.get(f"facet_{f}", []) for f in FACET_LABELS}
     )
-    
-    # Add markers for each school with valid coordinates
-    for idx, school in enumerate(SCHOOLS):
-        # Skip schools without valid coordinates
-        if not school.get('lat') or not school.get('lon'):
-            continue
-            
-        try:
-            lat = float(school['lat'])
-            lon = float(school['lon'])
-        except (ValueError, TypeError):
-            continue
-        
-        # Color code: blue for public, red for private
-        school_type = str(school.get("type", "")).lower()
-        color = "blue" if "public" in school_type else "lightred"
-        icon = "graduation-cap"
-        
-        # Create popup content
-        popup_html = f"""
-        <div style="font-family: Arial; min-width: 200px; max-width: 300px;">
-            <b style="font-size: 14px; color: #2c3e50;">{school.get('name', 'Unknown School')}</b><br>
-            <span style="font-size: 12px; color: #7f8c8d;">{school.get('type', 'N/A')}</span><br>
-            <span style="font-size: 11px; color: #95a5a6; margin-top: 4px; display: block;">
-                Click for details
-            </span>
-        </div>
-        """
-        
-        folium.Marker(
-            location=[lat, lon],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=school.get('name', 'Unknown School'),
-            icon=folium.Icon(color=color, icon=icon, prefix='fa')
-        ).add_to(m)
-    
-    return m
+    for facet, label in FACET_LABELS.items():
+        counts = facet_counts.get(facet, {})
+        st.sidebar.multiselect(
+            label,
+            options=list(counts),
+            format_func=lambda value, counts=counts: f"{value} ({counts.get(value, 0)})",
+            key=f"facet_{facet}",
+        )
+    FILTER_KEY = selection_key({f: st.session_state[f"facet_{f}"] for f in FACET_LABELS})
+    FILTERED_POSITIONS, FILTERED_IDS = filtered_rows(DATA, DATA.key("facets"), FILTER_KEY)
+
+# Full-text search: BM25 over the descriptive fields, indexed once per change
+# of those fields; matches are highlighted on the map and in the table
+@st.cache_resource(max_entries=2)
+def get_search_index(_data, key):
+    """Inverted index over pedagogy, curriculum, policy, notes, features and facilities"""
+    return _data.derive("search", ("search",), SearchIndex, SearchIndex.patched)
+
+@st.cache_data(max_entries=128)
+def search_schools(_data, key, query):
+    """Ranked (school id, score) pairs matching every query term"""
+    return get_search_index(_data, key).search(query)
+
+with METRICS.span("search"):
+    st.sidebar.markdown("### 🔍 Search")
+    search_query = " ".join(st.sidebar.text_input(
+        "Keywords", placeholder="Montessori, \"IB Diploma\", screen-light"
+    ).split())
+    SEARCH_RESULTS = search_schools(DATA, DATA.key("search"), search_query) if search_query else []
+    SEARCH_IDS = frozenset(school_id for school_id, _ in SEARCH_RESULTS)
+
+# Built maps are shared across reruns and sessions; a rerun only sends the
+# cached payload to the frontend
+@st.cache_resource(max_entries=32)
+def get_map_payload(_data, key, mode, filter_key=None, search_query="", travel=None):
+    """Serialized map for one state of its input columns, rendering mode, filter,
+    search and travel-time overlay ((lat, lon, profile, graph version) of the home point)"""
+    positions, _ = filtered_rows(_data, _data.key("facets"), filter_key)
+    highlight = (
+        frozenset(i for i, _ in search_schools(_data, _data.key("search"), search_query))
+        if search_query else frozenset()
+    )
+    isochrones = home_travel(_data, _data.key("spatial"), *travel)[1] if travel else None
+    return serialize_map(create_map(
+        map_records(_data.frame.iloc[positions]), mode=mode, highlight=highlight, isochrones=isochrones
+    ))
+
+# Viewport mode's marker layer, serialized once per view box (rounded, so
+# that a rerun at the same view, e.g. after a pin click, reuses it), filter
+# and search
+VIEW_BOX_DECIMALS = 4  # ~10 m
+
+@st.cache_resource(max_entries=64)
+def get_viewport_layer(_data, key, box=None, filter_key=None, search_query=""):
+    """Serialized marker layer of the filtered schools inside a view box; the
+    initial view while the map has not reported its bounds (box is None)"""
+    visible = visible_schools(build_spatial_index(_data, _data.key("spatial")), _data.frame, box)
+    if filter_key:
+        _, ids = filtered_rows(_data, _data.key("facets"), filter_key)
+        visible = [s for s in visible if s["id"] in ids]
+    highlight = (
+        frozenset(i for i, _ in search_schools(_data, _data.key("search"), search_query))
+        if search_query else frozenset()
+    )
+    return feature_group_script(marker_layer(visible, highlight))
+
+# Composite ranking: review-weighted (Bayesian) average over the rating
+# sources, scored once per change of the rating columns and weights; the
+# table then takes the top rows of each filter with a partial sort
+@st.cache_resource(max_entries=8)
+def get_ranking(_data, key, weights, prior_reviews):
+    """Composite scores for the loaded dataset and one weight setting"""
+    # Sharded, the prior mean is the whole dataset's (from the manifest; the
+    # dataset, and with it `key`, is a new one when the totals change), not
+    # the loaded regions'
+    totals = SHARDS.rating_totals if SHARDS is not None else None
+    return Ranking(_data.frame, dict(weights), prior_reviews, totals)
+
+@st.cache_resource(max_entries=32)
+def get_table(_data, key, filter_key=None, weights=weights_key(DEFAULT_WEIGHTS),
+              prior_reviews=DEFAULT_PRIOR_REVIEWS, limit=None):
+    """"All Schools at a Glance" table: the top `limit` schools of a filter state by score"""
+    positions, _ = filtered_rows(_data, _data.key("facets"), filter_key)
+    ranking = get_ranking(_data, _data.key("ranking"), weights, prior_reviews)
+
+    def build(frame):
+        top = ranking.top_k(positions, limit)
+        return build_table(frame.iloc[top], score=ranking.scores[top])
+
+    # Edited names, types etc. patch their rows; a change to the ranking or
+    # facet columns (which rows are shown, and in which order) rebuilds it
+    return _data.derive(
+        "table", ("table", "facets", "ranking"), build, partial(patch_table, score=ranking.scores),
+        params=(filter_key, weights, prior_reviews, limit),
+    )
+
+# "Near my home" search: the distance vector for a home point is computed once
+# (vectorized haversine, ball tree on large datasets) and reused while the
+# radius or other filters change
+MAX_HOME_RADIUS_KM = 50
+
+@st.cache_resource(max_entries=2)
+def get_proximity_index(_data, key):
+    """Coordinate arrays (and ball tree) for the loaded dataset; keyed on the
+    coordinates alone, so editing names does not rebuild it"""
+    return ProximityIndex.from_frame(_data.frame)
+
+@st.cache_resource
+def get_home_geocoder():
+    """Geocoder and rate limiter shared by every session of this process"""
+    from geocode import MIN_INTERVAL, RateLimiter, default_geocoder
+    return default_geocoder(), RateLimiter(MIN_INTERVAL)
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def geocode_home(text):
+    """(lat, lon) of an address, or None if it was not found; raises on
+    transient errors, which st.cache_data does not cache"""
+    from geocode import GeocodeCache, geocode_address
+    geocoder, limiter = get_home_geocoder()
+    cache = GeocodeCache()
+    try:
+        result = geocode_address(text, geocoder, cache, limiter)
+    finally:
+        cache.close()
+    if result["status"] == "error":
+        raise ConnectionError(result["error"])
+    return (result["lat"], result["lon"]) if result["status"] == "ok" else None
 
-# Main layout
-col1, col2 = st.columns([2, 1], gap="large")
+def locate_home(text):
+    """Resolve the home input to (lat, lon): literal coordinates or a geocode"""
+    coords = parse_lat_lon(text)
+    if coords:
+        return coords
+    try:
+        return geocode_home(text)
+    except ConnectionError:
+        return None
 
+@st.cache_data(max_entries=64)
+def home_search(_data, key, lat, lon):
+    """Schools within MAX_HOME_RADIUS_KM of the home point, nearest first"""
+    index = get_proximity_index(_data, _data.key("spatial"))
+    positions, distances = index.query_radius(lat, lon, MAX_HOME_RADIUS_KM)
+    return nearby_table(_data.frame, positions, distances)
+
+# Travel times over the offline road graph (python travel_time.py <extract.osm>);
+# one bounded Dijkstra per home point and profile gives the time to every
+# school and the isochrone polygons. Hidden when no graph has been built.
+# Everything derived from the graph is cached under its version, so
+# rebuilding road_graph.npz takes effect on the next rerun
+@st.cache_resource(max_entries=1)
+def get_road_graph(version):
+    """Road graph from ROAD_GRAPH_FILE at one version (mtime and size), or None"""
+    return RoadGraph.load(ROAD_GRAPH_FILE) if version else None
+
+ROAD_GRAPH = get_road_graph(graph_version(ROAD_GRAPH_FILE))
+
+@st.cache_resource(max_entries=2)
+def school_road_nodes(_data, key, graph_version):
+    """Nearest road node of every school (-1 when off the network)"""
+    return ROAD_GRAPH.snap(
+        _data.frame["lat"].to_numpy(dtype="float64", na_value=float("nan")),
+        _data.frame["lon"].to_numpy(dtype="float64", na_value=float("nan")),
+    )
+
+@st.cache_data(max_entries=32, show_spinner="Computing travel times...")
+def home_travel(_data, key, lat, lon, profile, graph_version):
+    """(minutes to each school by id, isochrone FeatureCollection) from a home point"""
+    minutes = ROAD_GRAPH.travel_minutes(ROAD_GRAPH.snap(lat, lon)[0], profile)
+    nodes = school_road_nodes(_data, key, graph_version)
+    per_school = np.where(nodes >= 0, minutes[nodes], np.inf)
+    per_school[np.isinf(per_school)] = np.nan  # unreachable within MAX_MINUTES
+    return (
+        pd.Series(per_school, index=_data.frame["id"].astype("string").to_numpy()),
+        ROAD_GRAPH.isochrones(minutes),
+    )
+
+# Comparison view: the selected rows are taken from the frame in one
+# positional selection and formatted column-wise, cached per selection
+@st.cache_resource(max_entries=2)
+def get_id_index(_data, key):
+    """School id -> row position"""
+    return id_index(_data.frame)
+
+@st.cache_resource(max_entries=2)
+def get_school_names(_data, key):
+    """School id -> name (the id when unnamed), for the comparison picker"""
+    ids = _data.frame["id"].astype("string")
+    names = _data.frame["name"].astype("string").fillna(ids)
+    return dict(zip(ids, names))
+
+@st.cache_data(max_entries=32)
+def get_comparison(_data, key, school_ids, weights, prior_reviews, home=None):
+    """Aligned comparison table for the given schools, one column each"""
+    positions = row_positions(get_id_index(_data, _data.key("compare")), school_ids)
+    ranking = get_ranking(_data, _data.key("ranking"), weights, prior_reviews)
+    return comparison_table(_data.frame, positions, ranking.scores, home)
+
+st.sidebar.markdown("### 🏠 Near my home")
+home_text = st.sidebar.text_input("Address or \"lat, lon\"", placeholder="39.4699, -0.3763")
+home_radius = st.sidebar.slider("Within (km)", 1, MAX_HOME_RADIUS_KM, 5)
+travel_profile = None
+if ROAD_GRAPH is not None:
+    travel_profile = st.sidebar.radio(
+        "Travel time",
+        options=[None, *PROFILE_LABELS],
+        format_func=lambda p: "Off (straight line)" if p is None else PROFILE_LABELS[p],
+        help=f"Road-network times and {'/'.join(map(str, ISOCHRONE_MINUTES))} min areas on the map",
+    )
+HOME_POINT = locate_home(home_text.strip()) if home_text.strip() else None
+TRAVEL = (*HOME_POINT, travel_profile, ROAD_GRAPH.version) if HOME_POINT and travel_profile else None
+
+st.sidebar.markdown("### 🏆 Ranking")
+with st.sidebar.expander("Score weights"):
+    RANK_WEIGHTS = weights_key({
+        "micole": st.slider("Micole ratings", 0.0, 2.0, DEFAULT_WEIGHTS["micole"], 0.1),
+        "google": st.slider("Google ratings", 0.0, 2.0, DEFAULT_WEIGHTS["google"], 0.1),
+    })
+    RANK_PRIOR = st.slider(
+        "Reviews needed to trust a rating", 0, 200, int(DEFAULT_PRIOR_REVIEWS), 5,
+        help="Schools with fewer reviews are pulled towards the average rating",
+    )
+
+# Map rendering mode: individual pins, client-side clusters, only the markers
+# inside the visible area, or one compact GeoJSON layer (for large datasets)
+MAP_MODE_LABELS = {
+    "markers": "Individual pins",
+    "cluster": "Clustered",
+    "viewport": "Visible area only",
+    "geojson": "Single GeoJSON layer",
+}
+map_mode = st.sidebar.radio(
+    "Map rendering",
+    options=list(MAP_MODE_LABELS),
+    format_func=MAP_MODE_LABELS.get,
+    index=0 if len(DATA.frame) <= 500 else 1,
+)
+
+# Main layout (columns, title and panel heading drawn in the shell above)
 with col1:
-    st.title("🎓 Valencia Schools Explorer")
-    st.markdown("**Click any pin on the map to see school details**")
-    st.caption("🔵 Public Schools  |  🔴 Private Schools")
+    st.caption("🔵 Public Schools  |  🔴 Private Schools" + ("  |  🟢 Search matches" if search_query else ""))
+    if SHARDS is not None:
+        st.caption(
+            f"Loaded {len(SHARD_FILES)} of {len(SHARDS.shards)} regions "
+            f"({len(DATA.frame)} of {SHARDS.manifest['count']} schools); pan the map to load more"
+        )
+    if FILTER_KEY:
+        st.caption(f"Showing {len(FILTERED_POSITIONS)} of {len(DATA.frame)} schools matching the filters")
     
+    # With a home point, the schools near it are listed beside the map
+    if home_text.strip():
+        map_area, home_area = st.columns([3, 2])
+    else:
+        map_area = home_area = st.container()
+
     # Render map
-    m = create_map()
-    map_data = st_folium(
-        m,
-        width=None,
-        height=600,
-        returned_objects=["last_object_clicked"]
-    )
+    with METRICS.span("map_build"):
+        map_payload = get_map_payload(
+            DATA, DATA.key("map", "facets", "search"), map_mode, FILTER_KEY, search_query,
+            TRAVEL,
+        )
+        returned_objects = ["last_object_clicked", "last_object_clicked_tooltip"]
+        map_kwargs = {}
+        if map_mode == "viewport":
+            # Only the markers inside the last reported bounds (at first, the
+            # initial view) are sent; the base map stays put and just the
+            # marker layer is swapped on pan/zoom
+            returned_objects.append("bounds")
+            box = bounds_box(st.session_state.map_bounds)
+            map_kwargs["feature_group"] = get_viewport_layer(
+                DATA, DATA.key("map", "facets", "search"),
+                box and tuple(round(v, VIEW_BOX_DECIMALS) for v in box), FILTER_KEY, search_query,
+            )
+        if SHARDS is not None:
+            # The map is rebuilt when other shards load; reopen it at the view
+            # the user panned to rather than at the center of the loaded schools
+            returned_objects += ["bounds", "zoom"]
+            box = bounds_box(st.session_state.map_bounds)
+            if box is not None and st.session_state.map_zoom is not None:
+                map_kwargs["center"] = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+                map_kwargs["zoom"] = st.session_state.map_zoom
+    
+    with METRICS.span("map_component"), map_area:
+        map_data = render_map(
+            map_payload,
+            width=None,
+            height=600,
+            returned_objects=list(dict.fromkeys(returned_objects)),
+            **map_kwargs
+        )
+        reported = map_data.get("bounds") if map_data else None
+        if SHARDS is not None and reported == map_payload["bounds"]:
+            # The component default (extent of the loaded schools) until the
+            # map reports its view; following it would load shard after shard
+            reported = None
+        if reported and reported != st.session_state.map_bounds:
+            st.session_state.map_bounds = reported
+            st.session_state.map_zoom = map_data.get("zoom")
+            # Viewport mode swaps its markers; sharded mode reloads when the view
+            # reaches shards that are not loaded yet
+            if map_mode == "viewport" or (
+                SHARDS is not None
+                and SHARDS.files_for_bounds(bounds_box(reported), center=DEFAULT_CENTER) != SHARD_FILES
+            ):
+                st.rerun()
     
     # Detect which school was clicked
-    if map_data and map_data.get("last_object_clicked"):
-        clicked_lat = map_data["last_object_clicked"].get("lat")
-        clicked_lng = map_data["last_object_clicked"].get("lng")
+    with METRICS.span("click"):
+        if map_data and map_data.get("last_object_clicked"):
+            clicked_lat = map_data["last_object_clicked"].get("lat")
+            clicked_lng = map_data["last_object_clicked"].get("lng")
         
-        if clicked_lat and clicked_lng:
-            # Find the school at these coordinates (with small tolerance)
-            for school in SCHOOLS:
-                if not school.get('lat') or not school.get('lon'):
-                    continue
-                try:
-                    school_lat = float(school['lat'])
-                    school_lon = float(school['lon'])
-                    if abs(school_lat - clicked_lat) < 0.001 and abs(school_lon - clicked_lng) < 0.001:
-                        st.session_state.selected_school = school
-                        break
-                except (ValueError, TypeError):
-                    continue
+            if clicked_lat and clicked_lng:
+                school_id = resolve_clicked_school(
+                    map_data["last_object_clicked"],
+                    map_data.get("last_object_clicked_tooltip")
+                )
+                if school_id is not None:
+                    st.session_state.selected_school_id = school_id
+    
+    # Schools near the home point, nearest first
+    with METRICS.span("home"), home_area:
+        if home_text.strip():
+            st.markdown("### 🏠 Near Your Home")
+            home = HOME_POINT
+            if home is None:
+                st.warning("Could not locate that address; try \"lat, lon\" instead.")
+            else:
+                nearby = home_search(DATA, DATA.key("proximity"), *home)
+                nearby = nearby[nearby["Distance (km)"] <= home_radius]
+                if FILTER_KEY:
+                    nearby = nearby[nearby["id"].isin(FILTERED_IDS)]
+                if TRAVEL:
+                    # Road-network times from the same cached search as the map overlay
+                    minutes = home_travel(DATA, DATA.key("spatial"), *TRAVEL)[0]
+                    nearby = nearby.assign(**{"Travel (min)": minutes.reindex(nearby["id"]).to_numpy()})
+                    nearby = nearby.sort_values("Travel (min)", kind="stable")
+                    st.caption(
+                        f"{PROFILE_LABELS[travel_profile]} times; shaded areas on the map are reachable "
+                        f"within {', '.join(map(str, ISOCHRONE_MINUTES))} min"
+                    )
+                if nearby.empty:
+                    st.info(f"No schools within {home_radius} km.")
+                else:
+                    st.dataframe(
+                        nearby.drop(columns="id"),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "Distance (km)": st.column_config.NumberColumn("Distance", format="%.2f km", width="small"),
+                            "Travel (min)": st.column_config.NumberColumn("Travel", format="%.0f min", width="small"),
+                            "School": st.column_config.TextColumn("School Name", width="large"),
+                        }
+                    )
+    
+    # Search matches, best first
+    with METRICS.span("search_results"):
+        if search_query:
+            st.markdown("### 🔍 Search Results")
+            matches = [(i, score) for i, score in SEARCH_RESULTS if not FILTER_KEY or i in FILTERED_IDS]
+            if not matches:
+                st.info(f"No schools match \"{search_query}\".")
+            else:
+                rows = DATA.frame.iloc[[SCHOOLS_BY_ID.position(i) for i, _ in matches]]
+                st.dataframe(
+                    pd.DataFrame({
+                        "School": rows["name"].to_numpy(),
+                        "Type": rows["type"].to_numpy(),
+                        "Municipality": rows["municipality"].to_numpy(),
+                        "Relevance": [round(score, 2) for _, score in matches],
+                    }),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "School": st.column_config.TextColumn("School Name", width="large"),
+                        "Relevance": st.column_config.NumberColumn("Relevance", format="%.2f", width="small"),
+                    }
+                )
     
     # Add schools table below the map
     st.markdown("---")
     st.markdown("### 📊 All Schools at a Glance")
     
-    # Prepare table data
-    table_data = []
-    for school in SCHOOLS:
-        # Extract screen policy
-        screen_policy = school.get("device_policy_summary") or ""
-        if screen_policy and len(str(screen_policy)) > 60:
-            screen_policy = str(screen_policy)[:60] + "..."
-        
-        # Extract Micole rating - handle None, empty strings, etc.
-        micole_rating = school.get("micole_rating")
-        if micole_rating is None or micole_rating == "":
-            micole_display = "—"
-        else:
-            try:
-                micole_display = float(micole_rating)
-            except (ValueError, TypeError):
-                micole_display = "—"
-        
-        table_data.append({
-            "Micole Rating": micole_display,
-            "School": school.get("name") or "N/A",
-            "Type": school.get("type") or "N/A",
-            "Municipality": school.get("municipality") or "N/A",
-            "Ages": school.get("ages") or "N/A",
-            "Curriculum": school.get("curriculum") or "N/A",
-            "Languages": school.get("languages_day_to_day") or "N/A",
-            "Screen Policy": screen_policy or "N/A"
-        })
-    
-    df = pd.DataFrame(table_data)
-    
-    # Sort by Micole Rating (descending), with "—" (no rating) at the bottom
-    def sort_key(x):
-        if x == "—":
-            return -999
-        try:
-            return float(x)
-        except (ValueError, TypeError):
-            return -999
+    # Cached per version of the table's columns, filter state and weights
+    with METRICS.span("table"):
+        TABLE_LIMITS = {"Top 50": 50, "Top 200": 200, "Top 1000": 1000, "All": None}
+        table_limit = st.selectbox("Show", list(TABLE_LIMITS), index=1 if len(DATA.frame) > 200 else 3)
+        df = get_table(
+            DATA, DATA.key("table", "facets", "ranking"), FILTER_KEY, RANK_WEIGHTS, RANK_PRIOR,
+            TABLE_LIMITS[table_limit],
+        )
     
-    df['_sort_key'] = df['Micole Rating'].apply(sort_key)
-    df = df.sort_values('_sort_key', ascending=False).drop('_sort_key', axis=1).reset_index(drop=True)
+        # Display as interactive dataframe, search matches shaded
+        st.dataframe(
+            highlight_rows(df, SEARCH_IDS) if SEARCH_IDS else df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Score": st.column_config.NumberColumn(
+                    "🏆 Score", format="%.2f", width="small",
+                    help="Review-weighted average of the Micole and Google ratings",
+                ),
+                "Micole Rating": st.column_config.TextColumn("⭐ Micole", width="small"),
+                "School": st.column_config.TextColumn("School Name", width="large"),
+                "Type": st.column_config.TextColumn("Type", width="small"),
+                "Municipality": st.column_config.TextColumn("Location", width="small"),
+                "Ages": st.column_config.TextColumn("Ages", width="small"),
+                "Curriculum": st.column_config.TextColumn("Curriculum", width="medium"),
+                "Languages": st.column_config.TextColumn("Languages", width="medium"),
+                "Screen Policy": st.column_config.TextColumn("Screen/Device Policy", width="large"),
+                "id": None
+            }
+        )
     
-    # Display as interactive dataframe
-    st.dataframe(
-        df,
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "Micole Rating": st.column_config.TextColumn("⭐ Micole", width="small"),
-            "School": st.column_config.TextColumn("School Name", width="large"),
-            "Type": st.column_config.TextColumn("Type", width="small"),
-            "Municipality": st.column_config.TextColumn("Location", width="small"),
-            "Ages": st.column_config.TextColumn("Ages", width="small"),
-            "Curriculum": st.column_config.TextColumn("Curriculum", width="medium"),
-            "Languages": st.column_config.TextColumn("Languages", width="medium"),
-            "Screen Policy": st.column_config.TextColumn("Screen/Device Policy", width="large")
-        }
-    )
-
 with col2:
-    st.markdown("### 📋 School Information")
-    
-    if st.session_state.selected_school:
-        school = st.session_state.selected_school
-        
-        # School header
-        school_name = school.get("name") or "Unknown School"
-        school_type = school.get("type") or "N/A"
-        st.markdown(f'<div class="school-header">{school_name}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="school-type">{school_type}</div>', unsafe_allow_html=True)
-        
-        # Special notes at the top as summary
-        special_notes = school.get("special_notes")
-        if special_notes and str(special_notes).strip():
-            st.markdown(f'<div class="info-value" style="background-color: #f0f2f6; padding: 12px; border-radius: 8px; margin: 12px 0; font-size: 0.95em; line-height: 1.5;">{special_notes}</div>', unsafe_allow_html=True)
-            st.markdown("---")
-        
-        # Address & Municipality
-        st.markdown('<div class="info-label">📍 Location</div>', unsafe_allow_html=True)
-        address = school.get("address") or "Address not available"
-        municipality = school.get("municipality") or ""
-        neighborhood = school.get("neighborhood") or ""
-        location_parts = [address]
-        if neighborhood:
-            location_parts.append(f"<i>{neighborhood}</i>")
-        if municipality:
-            location_parts.append(f"<b>{municipality}</b>")
-        st.markdown(f'<div class="info-value">{"<br>".join(location_parts)}</div>', unsafe_allow_html=True)
-        
-        # Founded
-        founded = school.get("founded")
-        if founded:
-            st.markdown('<div class="info-label">📅 Founded</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{founded}</div>', unsafe_allow_html=True)
-        
-        # Student Count
-        student_count = school.get("student_count")
-        if student_count and str(student_count).strip():
-            st.markdown('<div class="info-label">👥 Students</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{student_count}</div>', unsafe_allow_html=True)
-        
-        # Ages & Stages
-        ages = school.get("ages")
-        if ages and str(ages).strip():
-            st.markdown('<div class="info-label">👶 Ages</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{ages}</div>', unsafe_allow_html=True)
-        
-        stages = school.get("stages")
-        if stages and str(stages).strip():
-            st.markdown('<div class="info-label">🎓 Stages</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{stages}</div>', unsafe_allow_html=True)
-        
-        # Curriculum
-        curriculum = school.get("curriculum")
-        if curriculum and str(curriculum).strip():
-            st.markdown('<div class="info-label">📚 Curriculum</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{curriculum}</div>', unsafe_allow_html=True)
-        
-        # Languages
-        languages_display = school.get("languages_day_to_day") or ""
-        if languages_display and str(languages_display).strip():
-            st.markdown('<div class="info-label">🌐 Languages (Day-to-Day)</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{languages_display}</div>', unsafe_allow_html=True)
-        
-        languages_taught = school.get("languages_taught") or ""
-        if languages_taught and str(languages_taught).strip():
-            st.markdown('<div class="info-label">🗣️ Languages Taught</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{languages_taught}</div>', unsafe_allow_html=True)
-        
-        # Screen/Device Policy
-        device_policy = school.get("device_policy_summary") or ""
-        if device_policy and str(device_policy).strip():
-            st.markdown('<div class="info-label">💻 Device Policy</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{device_policy}</div>', unsafe_allow_html=True)
+    with METRICS.span("detail"):
+        if st.session_state.selected_school_id in SCHOOLS_BY_ID:
+            st.markdown(
+                get_detail_html(
+                    DATA, DATA.row_versions[st.session_state.selected_school_id], st.session_state.selected_school_id
+                ),
+                unsafe_allow_html=True
+            )
+            st.button(
+                "➕ Add to comparison",
+                on_click=add_to_comparison,
+                args=(st.session_state.selected_school_id,),
+                disabled=(
+                    st.session_state.selected_school_id in st.session_state.compare_ids
+                    or len(st.session_state.compare_ids) >= MAX_COMPARE
+                ),
+            )
         
-        # Pedagogy
-        pedagogy = school.get("pedagogy")
-        if pedagogy and str(pedagogy).strip():
-            st.markdown('<div class="info-label">🎯 Pedagogy</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{pedagogy}</div>', unsafe_allow_html=True)
-        
-        # Fees
-        fees_range = school.get("fees_range")
-        if fees_range and str(fees_range).strip():
-            st.markdown('<div class="info-label">💰 Fees</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{fees_range}</div>', unsafe_allow_html=True)
-        
-        # Reviews
-        review_parts = []
-        google_rating = school.get("google_rating")
-        google_reviews = school.get("google_reviews")
-        micole_rating = school.get("micole_rating")
-        micole_reviews = school.get("micole_reviews")
-        
-        if google_rating:
-            reviews_text = f" ({google_reviews} reviews)" if google_reviews else ""
-            review_parts.append(f"Google: {google_rating}⭐{reviews_text}")
-        if micole_rating:
-            reviews_text = f" ({micole_reviews} reviews)" if micole_reviews else ""
-            review_parts.append(f"Micole: {micole_rating}⭐{reviews_text}")
-        
-        if review_parts:
-            st.markdown('<div class="info-label">⭐ Reviews</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="info-value">{" | ".join(review_parts)}</div>', unsafe_allow_html=True)
-        
-        st.divider()
-        
-        # Google Maps link
-        lat = school.get('lat')
-        lon = school.get('lon')
-        if lat and lon:
-            try:
-                gmaps_url = f"https://www.google.com/maps/search/?api=1&query={float(lat)},{float(lon)}"
-                st.markdown(f"[🗺️ Open in Google Maps]({gmaps_url})")
-            except (ValueError, TypeError):
-                pass
-        
-    else:
-        st.info("👆 Click a school pin on the map to view details")
+        else:
+            st.info("👆 Click a school pin on the map to view details")
         
-        # Show school count
-        st.divider()
-        st.metric("Total Schools", len(SCHOOLS))
+            # Show school count
+            st.divider()
+            st.metric("Total Schools", len(DATA.frame))
         
-        public_count = sum(1 for s in SCHOOLS if s.get("type") and "public" in str(s.get("type", "")).lower())
-        private_count = len(SCHOOLS) - public_count
+            public_count = FACET_INDEX.bitmaps["type"].get("Public", 0).bit_count()
+            private_count = len(DATA.frame) - public_count
         
-        col_a, col_b = st.columns(2)
-        with col_a:
-            st.metric("Public", public_count)
-        with col_b:
-            st.metric("Private", private_count)
+            col_a, col_b = st.columns(2)
+            with col_a:
+                st.metric("Public", public_count)
+            with col_b:
+                st.metric("Private", private_count)
+
+# Side-by-side comparison: schools are picked by name here, or added from
+# the detail panel of the one selected on the map
+with METRICS.span("compare"):
+    st.markdown("---")
+    st.markdown("### ⚖️ Compare Schools")
+    school_names = get_school_names(DATA, DATA.key("compare"))
+    st.multiselect(
+        "Schools to compare",
+        options=list(SCHOOLS_BY_ID),
+        format_func=school_names.get,
+        max_selections=MAX_COMPARE,
+        placeholder="Type a school name",
+        key="compare_ids",
+    )
+    if len(st.session_state.compare_ids) < 2:
+        st.caption(f"Pick at least two schools to compare them side by side (up to {MAX_COMPARE}).")
+    if st.session_state.compare_ids:
+        st.table(get_comparison(
+            DATA, DATA.key("compare", "ranking"), tuple(st.session_state.compare_ids),
+            RANK_WEIGHTS, RANK_PRIOR, HOME_POINT,
+        ))
+
+# Timings overlay (debug) and export; spans above cover everything but this
+record = METRICS.finish()
+if record and METRICS.overlay:
+    with st.sidebar.expander("⏱️ Rerun timings", expanded=True):
+        st.caption(f"Total {record['total_ms']:.1f} ms · RSS {record['rss_delta_kb'] or 0:+,} KiB "
+                   f"(now {record['rss_kb'] or 0:,} KiB)")
+        st.dataframe(record["spans"], hide_index=True, use_container_width=True)
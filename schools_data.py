@@ -669,19 +669,59 @@ SCHOOLS = [
 
 
 # Helper functions
+#
+# Lookups go through dict indexes built lazily on first use. They are rebuilt
+# automatically when SCHOOLS is replaced or changes length; call
+# invalidate_indexes() after editing records in place.
+
+_INDEXES: dict | None = None
+_INDEXED_SCHOOLS: list | None = None  # the list indexed, kept so its id is never reused
+_INDEXED_LENGTH = 0
+
+
+def _build_indexes() -> dict:
+    by_id: dict[str, dict] = {}
+    by_municipality: dict[str, list[dict]] = {}
+    by_type: dict[str, list[int]] = {}
+    for position, school in enumerate(SCHOOLS):
+        by_id.setdefault(school["id"], school)
+        by_municipality.setdefault(school["municipality"].lower(), []).append(school)
+        by_type.setdefault(school["type"].lower(), []).append(position)
+    return {"id": by_id, "municipality": by_municipality, "type": by_type}
+
+
+def _indexes() -> dict:
+    global _INDEXES, _INDEXED_SCHOOLS, _INDEXED_LENGTH
+    if _INDEXES is None or SCHOOLS is not _INDEXED_SCHOOLS or len(SCHOOLS) != _INDEXED_LENGTH:
+        _INDEXES = _build_indexes()
+        _INDEXED_SCHOOLS = SCHOOLS
+        _INDEXED_LENGTH = len(SCHOOLS)
+    return _INDEXES
+
+
+def invalidate_indexes() -> None:
+    """Drop the lookup indexes; they are rebuilt on the next lookup."""
+    global _INDEXES, _INDEXED_SCHOOLS
+    _INDEXES = None
+    _INDEXED_SCHOOLS = None
+
+
 def get_school_by_id(school_id: str) -> dict | None:
     """Retrieve a school by its unique ID."""
-    for school in SCHOOLS:
-        if school["id"] == school_id:
-            return school
-    return None
+    return _indexes()["id"].get(school_id)
 
 
 def get_schools_by_municipality(municipality: str) -> list[dict]:
     """Get all schools in a specific municipality."""
-    return [s for s in SCHOOLS if s["municipality"].lower() == municipality.lower()]
+    return list(_indexes()["municipality"].get(municipality.lower(), []))
 
 
 def get_schools_by_type(school_type: str) -> list[dict]:
-    """Get all schools of a specific type."""
-    return [s for s in SCHOOLS if school_type.lower() in s["type"].lower()]
+    """Get all schools of a specific type.
+
+    A case-insensitive substring match: "concert" finds "Concertado". It is
+    tested once per distinct type string rather than once per school.
+    """
+    query = school_type.lower()
+    positions = [p for text, group in _indexes()["type"].items() if query in text for p in group]
+    return [SCHOOLS[p] for p in sorted(positions)]
@@ -0,0 +1,93 @@
+"""
+session_memory.py
+Measure the memory a browser session costs the Streamlit server.
+
+Runs schoolapp.py headless (streamlit.testing AppTest) for N simulated
+sessions, each of which selects a school, and reports with tracemalloc:
+
+- retained per session: growth of traced memory per live session, after a
+  warm-up session has filled the shared caches
+- rerun peak: peak traced memory above the baseline during one rerun
+- session state: deep size of the values held in st.session_state
+
+AppTest keeps each session's rendered elements alive, so "retained" includes
+that constant overhead; compare runs of different app versions rather than
+reading it as an absolute figure.
+
+Usage:
+    python session_memory.py [--sessions 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tracemalloc
+
+from streamlit.testing.v1 import AppTest
+
+from dataset import frame_to_records, load_dataset
+
+APP_FILE = "schoolapp.py"
+SELECTION_KEY = "selected_school_id"
+
+
+def deep_size(obj, seen=None) -> int:
+    """Approximate deep size in bytes of dicts, lists, tuples and scalars."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    return size
+
+
+def open_session(school_id: str) -> AppTest:
+    at = AppTest.from_file(APP_FILE, default_timeout=120)
+    at.run()
+    at.session_state[SELECTION_KEY] = school_id
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception)
+    return at
+
+
+def measure(n_sessions: int) -> dict:
+    ids = [s["id"] for s in frame_to_records(load_dataset())]
+    tracemalloc.start()
+    sessions = [open_session(ids[0])]  # warm-up: fills cache_resource/cache_data
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(n_sessions):
+        sessions.append(open_session(ids[i % len(ids)]))
+    retained = (tracemalloc.get_traced_memory()[0] - baseline) / n_sessions
+
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    sessions[-1].run()
+    rerun_peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    state = sessions[-1].session_state
+    state_size = deep_size(state.to_dict())
+    return {
+        "sessions": n_sessions,
+        "retained_per_session_kb": round(retained / 1024, 1),
+        "rerun_peak_kb": round(rerun_peak / 1024, 1),
+        "session_state_bytes": state_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory held per app session.")
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+    for key, value in measure(args.sessions).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+shards.py
+Region-sharded datasets, loaded lazily by map bounds.
+
+Partitions the current dataset (load_dataset) into Parquet shards, one per
+geotile of --tile-deg degrees or one per municipality (--by municipality),
+plus a small manifest.json with each shard's file, row count and bounding box,
+and the dataset-wide rating totals the ranking uses for its prior mean (so
+scores do not depend on which shards are loaded).
+Schools without coordinates go into one "unlocated" shard that is always
+loaded, so they still reach the table, search and facets.
+
+When shards/manifest.json exists the app runs sharded: it loads only the
+shards whose bounding box intersects the (padded) map bounds and keeps the
+rest on disk; panning into a new region loads its shards on the next rerun.
+The manifest records the dataset version it was built from; when the data
+is edited afterwards the app re-shards it with the same partitioning (see
+refresh_stale_shards). Files are written aside and renamed over the old
+ones, so running workers never read a half-written shard or manifest.
+
+Usage:
+    python shards.py [--by tile|municipality] [--tile-deg 0.25] [--output shards]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import warnings
+from functools import partial
+
+import pandas as pd
+
+from dataset import CATEGORY_COLUMNS, current_version, dataset_version, load_dataset
+from map_builder import DEFAULT_CENTER, initial_box
+from ranking import rating_totals
+
+SHARD_DIR = "shards"
+MANIFEST_NAME = "manifest.json"
+DEFAULT_TILE_DEG = 0.25
+UNLOCATED = "unlocated"
+
+
+def _slug(text: str) -> str:
+    text = re.sub(r"[^\w-]+", "_", str(text).casefold()).strip("_")
+    return text or "unknown"
+
+
+def shard_keys(df: pd.DataFrame, by: str = "tile", tile_deg: float = DEFAULT_TILE_DEG) -> pd.Series:
+    """Shard name for every row."""
+    located = df["lat"].notna() & df["lon"].notna()
+    if by == "tile":
+        row = (df["lat"] // tile_deg).astype("Int64").astype("string")
+        col = (df["lon"] // tile_deg).astype("Int64").astype("string")
+        keys = "t_" + row + "_" + col
+    elif by == "municipality":
+        keys = "m_" + df["municipality"].astype("string").fillna("unknown").map(_slug)
+    else:
+        raise ValueError(f"Unknown shard partitioning {by!r}; expected 'tile' or 'municipality'")
+    return keys.where(located, UNLOCATED)
+
+
+def _write_replacing(path: str, write) -> None:
+    """write(tmp) to a file beside path, then rename it over path."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_json(data: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def write_shards(df: pd.DataFrame, output: str = SHARD_DIR, by: str = "tile",
+                 tile_deg: float = DEFAULT_TILE_DEG, source_version: str | None = None) -> dict:
+    """Write one Parquet file per shard plus the manifest; returns the manifest."""
+    os.makedirs(output, exist_ok=True)
+    shards = []
+    for name, part in df.groupby(shard_keys(df, by, tile_deg), sort=True):
+        file = f"{name}.parquet"
+        _write_replacing(os.path.join(output, file), partial(part.to_parquet, index=False))
+        bbox = None
+        if name != UNLOCATED:
+            bbox = [float(part["lat"].min()), float(part["lon"].min()),
+                    float(part["lat"].max()), float(part["lon"].max())]
+        shards.append({"name": name, "file": file, "count": len(part), "bbox": bbox})
+
+    manifest = {
+        "version": source_version,
+        "by": by,
+        "tile_deg": tile_deg if by == "tile" else None,
+        "count": len(df),
+        "rating_totals": rating_totals(df),
+        "shards": shards,
+    }
+    _write_replacing(os.path.join(output, MANIFEST_NAME), partial(_write_json, manifest))
+
+    # Drop shards left over from an earlier partitioning, now that the
+    # manifest no longer lists them
+    current = {s["file"] for s in shards}
+    for file in os.listdir(output):
+        if file.endswith(".parquet") and file not in current:
+            os.remove(os.path.join(output, file))
+    return manifest
+
+
+def _intersects(bbox, south, west, north, east) -> bool:
+    return bbox[0] <= north and bbox[2] >= south and bbox[1] <= east and bbox[3] >= west
+
+
+class ShardManifest:
+    """The shards of a partitioned dataset and the files to load for a map view."""
+
+    def __init__(self, manifest: dict, directory: str = SHARD_DIR):
+        self.manifest = manifest
+        self.directory = directory
+        self.shards = manifest["shards"]
+        # None for manifests written before the totals were recorded
+        self.rating_totals = manifest.get("rating_totals")
+
+    @classmethod
+    def load(cls, directory: str = SHARD_DIR) -> ShardManifest | None:
+        """The manifest in directory, or None when the dataset is not sharded."""
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), directory)
+
+    def files_for_bounds(self, box: tuple[float, float, float, float] | None,
+                         center: tuple[float, float] = DEFAULT_CENTER, pad: float = 0.1) -> tuple[str, ...]:
+        """Shard files intersecting a (south, west, north, east) box, padded by a
+        fraction of its size; the initial map view around `center` when no box
+        is known yet (see map_builder.initial_box)."""
+        south, west, north, east = box or initial_box(center)
+        dlat, dlon = (north - south) * pad, (east - west) * pad
+        return tuple(
+            s["file"] for s in self.shards
+            if s["bbox"] is None or _intersects(s["bbox"], south - dlat, west - dlon, north + dlat, east + dlon)
+        )
+
+    def version(self, files: tuple[str, ...]) -> str:
+        """Version stamp of a set of shard files; changes when any of them is rewritten."""
+        stamps = [f"{f}@{dataset_version(os.path.join(self.directory, f))}" for f in files]
+        digest = hashlib.sha256(",".join([str(self.manifest.get("version"))] + stamps).encode())
+        return f"shards-{digest.hexdigest()[:16]}"
+
+    def load_frame(self, files: tuple[str, ...]) -> pd.DataFrame:
+        """Concatenated frame of the given shards, with the dataset dtypes."""
+        parts = [pd.read_parquet(os.path.join(self.directory, f)) for f in files]
+        if not parts:  # nothing in view: an empty frame with the shard columns
+            return pd.read_parquet(os.path.join(self.directory, self.shards[0]["file"])).iloc[0:0]
+        df = pd.concat(parts, ignore_index=True)
+        for col in CATEGORY_COLUMNS:  # categories differ per shard
+            if col in df:
+                df[col] = df[col].astype("category")
+        return df
+
+
+_RESHARD_LOCK = threading.Lock()
+_FAILED_RESHARDS: set[str] = set()  # dataset versions re-sharding already failed for
+
+
+def refresh_stale_shards(manifest: ShardManifest) -> ShardManifest:
+    """The manifest, after re-sharding the current dataset (with the same
+    partitioning) if it was built from an older version of the data.
+
+    A failure warns once per dataset version; the old shards are then
+    served until shards.py is run again.
+    """
+    version = current_version()
+    if manifest.manifest.get("version") == version:
+        return manifest
+    with _RESHARD_LOCK:
+        latest = ShardManifest.load(manifest.directory) or manifest
+        if latest.manifest.get("version") == version:  # re-sharded meanwhile by another thread or process
+            return latest
+        if version in _FAILED_RESHARDS:
+            return latest
+        try:
+            write_shards(
+                load_dataset(), manifest.directory, latest.manifest.get("by", "tile"),
+                latest.manifest.get("tile_deg") or DEFAULT_TILE_DEG, version,
+            )
+        except Exception as exc:  # e.g. a read-only checkout
+            _FAILED_RESHARDS.add(version)
+            warnings.warn(
+                f"{manifest.directory}/ was built from an older version of the data and could not "
+                f"be rebuilt ({exc!r}); serving the old shards. Run shards.py to fix.",
+                RuntimeWarning, stacklevel=2,
+            )
+            return latest
+        return ShardManifest.load(manifest.directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition the dataset into region shards.")
+    parser.add_argument("--by", choices=["tile", "municipality"], default="tile")
+    parser.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG,
+                        help="tile size in degrees for --by tile")
+    parser.add_argument("--output", default=SHARD_DIR)
+    args = parser.parse_args()
+    if not (args.tile_deg > 0 and math.isfinite(args.tile_deg)):
+        parser.error("--tile-deg must be a positive number")
+
+    manifest = write_shards(load_dataset(), args.output, args.by, args.tile_deg, current_version())
+    print(f"Wrote {len(manifest['shards'])} shards ({manifest['count']} schools) to {args.output}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+spatial_index.py
+Static KD-tree over school coordinates.
+
+Built once when the dataset loads and used to resolve a map click (which
+reports the clicked marker's exact lat/lon) back to a school id in O(log n),
+without scanning every record.
+
+Longitudes are scaled by the cosine of the mean latitude so that Euclidean
+distance in the tree tracks ground distance; distances are returned in km.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+
+import numpy as np
+
+KM_PER_DEGREE = 111.195
+
+
+class SpatialIndex:
+    """2-d tree mapping (lat, lon) points to school ids."""
+
+    def __init__(self, points: list[tuple[float, float, str]]):
+        if points:
+            mean_lat = sum(p[0] for p in points) / len(points)
+            self._scale = math.cos(math.radians(mean_lat))
+        else:
+            self._scale = 1.0
+        nodes = [(lat, lon * self._scale, school_id) for lat, lon, school_id in points]
+        self._root = self._build(nodes, 0)
+        self.size = len(nodes)
+
+    @classmethod
+    def from_schools(cls, schools) -> SpatialIndex:
+        """Build an index from school records, skipping rows without coordinates."""
+        points = []
+        for school in schools:
+            lat, lon = school.get("lat"), school.get("lon")
+            if lat is None or lon is None:
+                continue
+            try:
+                lat, lon = float(lat), float(lon)
+            except (ValueError, TypeError):
+                continue
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            points.append((lat, lon, school["id"]))
+        return cls(points)
+
+    @classmethod
+    def from_frame(cls, df) -> SpatialIndex:
+        """Build an index from the id, lat and lon columns of a dataset frame."""
+        lat = df["lat"].to_numpy(dtype="float64", na_value=math.nan)
+        lon = df["lon"].to_numpy(dtype="float64", na_value=math.nan)
+        located = ~(np.isnan(lat) | np.isnan(lon))
+        ids = df["id"].astype("string").to_numpy()[located]
+        return cls(list(zip(lat[located].tolist(), lon[located].tolist(), ids)))
+
+    def _build(self, nodes, depth):
+        if not nodes:
+            return None
+        axis = depth % 2
+        nodes.sort(key=lambda n: n[axis])
+        mid = len(nodes) // 2
+        return (
+            nodes[mid],
+            axis,
+            self._build(nodes[:mid], depth + 1),
+            self._build(nodes[mid + 1:], depth + 1),
+        )
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple[float, str]]:
+        """Return up to k (distance_km, school_id) pairs, nearest first."""
+        if self._root is None or k <= 0:
+            return []
+        target = (lat, lon * self._scale)
+        heap: list[tuple[float, int, str]] = []  # max-heap on squared distance
+        counter = 0
+
+        # Depth-first descent, visiting the near side first and pruning the
+        # far side when the splitting plane is further than the k-th best.
+        def visit(node):
+            nonlocal counter
+            if node is None:
+                return
+            point, axis, left, right = node
+            d2 = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, counter, point[2]))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, counter, point[2]))
+            counter += 1
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return sorted(
+            (math.sqrt(-d2) * KM_PER_DEGREE, school_id) for d2, _, school_id in heap
+        )
+
+    def in_bounds(self, south: float, west: float, north: float, east: float) -> list[str]:
+        """Return the ids of all schools inside a lat/lon bounding box."""
+        lo = (south, west * self._scale)
+        hi = (north, east * self._scale)
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            point, axis, left, right = node
+            if lo[0] <= point[0] <= hi[0] and lo[1] <= point[1] <= hi[1]:
+                found.append(point[2])
+            if lo[axis] <= point[axis]:
+                visit(left)
+            if point[axis] <= hi[axis]:
+                visit(right)
+
+        visit(self._root)
+        return found
@@ -0,0 +1,192 @@
+"""
+startup_benchmark.py
+Cold-start timings for schoolapp.py: import costs and the first render.
+
+Every measurement runs in a fresh interpreter, as a newly started server
+worker would:
+
+- imports: `python -X importtime` over the modules schoolapp.py always
+  imports at module level (imports under an `if` or inside functions, such
+  as geocode, only run for some inputs and are left out), in the app's order
+  after streamlit itself; reports the cumulative time of each of those
+  imports and their total
+- first render: one run of the app under streamlit's AppTest with
+  SCHOOLAPP_METRICS_FILE set; reports when the page shell was drawn (end of
+  the "shell" span, from the start of the script), the deferred imports, the
+  data load, the whole first run and a second, warm rerun
+
+Results are written as JSON; pass --compare with an earlier results file to
+print the ratio of each median against it.
+
+Usage:
+    python startup_benchmark.py [--repeat 5] [--output startup_results.json]
+                                [--compare old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import describe, git_commit
+
+APP = "schoolapp.py"
+OUTPUT_FILE = "startup_results.json"
+
+# Spans of the first run reported on their own (see schoolapp.py)
+FIRST_RUN_STAGES = ["imports", "load", "map_build", "map_component", "table"]
+
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+first = time.perf_counter() - start
+at.run()
+print(json.dumps({"wall": first, "exception": bool(at.exception)}))
+"""
+
+
+def app_imports(path: str = APP) -> list[str]:
+    """Modules the app imports unconditionally at module level, in order.
+
+    Imports inside `with` and `try` bodies count (the app imports its heavy
+    modules inside a timing span); those under `if` or in functions do not.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+
+    def visit(nodes):
+        for node in nodes:
+            if isinstance(node, ast.Import):
+                modules.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                modules.append(node.module)
+            elif isinstance(node, ast.With):
+                visit(node.body)
+            elif isinstance(node, ast.Try):
+                visit(node.body + node.orelse + node.finalbody)
+    visit(tree.body)
+    return list(dict.fromkeys(modules))
+
+
+def import_times(modules: list[str]) -> dict[str, float]:
+    """Cumulative import time in seconds of each module, imported in order
+    after streamlit in a fresh interpreter (0 if already loaded by then)."""
+    code = "import streamlit\n" + "".join(f"import {m}\n" for m in modules)
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if name.startswith("  ") or not cum.strip().isdigit():
+            continue  # nested import, or the header line
+        cumulative[name.strip()] = int(cum) / 1e6
+    return {m: cumulative.get(m, 0.0) for m in ["streamlit"] + modules}
+
+
+def first_render(app: str) -> dict[str, float]:
+    """Span timings (seconds) of one cold run of the app, plus a warm rerun."""
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = os.path.join(tmp, "metrics.jsonl")
+        env = {**os.environ, "SCHOOLAPP_METRICS_FILE": metrics}
+        env.pop("SCHOOLAPP_DEBUG", None)
+        out = subprocess.run(
+            [sys.executable, "-c", RENDER_SCRIPT, os.path.abspath(app)],
+            capture_output=True, text=True, check=True, env=env,
+        )
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+        if run["exception"]:
+            raise RuntimeError(f"{app} raised an exception during the first render")
+        with open(metrics, encoding="utf-8") as f:
+            first, second = [json.loads(line) for line in f][:2]
+
+    spans = {s["stage"]: s for s in first["spans"]}
+    shell = spans["shell"]
+    timings = {
+        "first_render.shell_drawn": (shell["start_ms"] + shell["ms"]) / 1000,
+        "first_render.total": first["total_ms"] / 1000,
+        "first_render.apptest_wall": run["wall"],
+        "rerun.total": second["total_ms"] / 1000,
+    }
+    for stage in FIRST_RUN_STAGES:
+        if stage in spans:
+            timings[f"first_render.{stage}"] = spans[stage]["ms"] / 1000
+    return timings
+
+
+def summarize(samples: list[dict[str, float]]) -> dict:
+    return {
+        name: {
+            "min": min(s[name] for s in samples),
+            "median": statistics.median(s[name] for s in samples),
+            "runs": len(samples),
+        }
+        for name in samples[0]
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Print current/baseline ratios of every median in both files."""
+    old = baseline.get("results", {})
+    for name, stats in results["results"].items():
+        if name in old and old[name]["median"]:
+            ratio = stats["median"] / old[name]["median"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"  {name:<40} {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the app's imports and first render.")
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    modules = app_imports(args.app)
+    samples = []
+    for _ in range(args.repeat):
+        imports = import_times(modules)
+        sample = {f"import.{m}": t for m, t in imports.items()}
+        sample["import.app_total"] = sum(t for m, t in imports.items() if m != "streamlit")
+        sample.update(first_render(args.app))
+        samples.append(sample)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "results": summarize(samples),
+    }
+    for name, stats in results["results"].items():
+        print(f"  {name:<40} {describe(stats)}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Median ratios against {args.compare} ({baseline.get('commit')}):")
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+table_builder.py
+Vectorized build of the "All Schools at a Glance" table.
+
+Works on whole columns of the typed dataset frame (see dataset.py) rather
+than looping over records; the app caches the result per dataset version,
+filter state and ranking weights, so reruns caused by map clicks do no table
+work, and patch_table() rebuilds only the rows of schools edited in place.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Display column -> dataset column
+TEXT_COLUMNS = {
+    "School": "name",
+    "Type": "type",
+    "Municipality": "municipality",
+    "Ages": "ages",
+    "Curriculum": "curriculum",
+    "Languages": "languages_day_to_day",
+}
+
+POLICY_PREVIEW_CHARS = 60
+
+
+def _text_or_na(df: pd.DataFrame, column: str) -> pd.Series:
+    """Column as strings, with missing or empty values shown as "N/A"."""
+    if column not in df:
+        return pd.Series("N/A", index=df.index, dtype="string")
+    values = df[column].astype("string")
+    return values.mask(values.isna() | values.eq(""), "N/A")
+
+
+def build_table(df: pd.DataFrame, score=None) -> pd.DataFrame:
+    """Display table sorted by composite score (see ranking.py) when given,
+    else by Micole rating (descending); unscored schools last."""
+    rating = df["micole_rating_value"] if "micole_rating_value" in df else pd.Series(float("nan"), index=df.index)
+    key = rating if score is None else pd.Series(score, index=df.index, dtype="float64")
+    order = key.sort_values(ascending=False, na_position="last", kind="stable").index
+    df = df.loc[order]
+    rating = rating.loc[order]
+
+    table = pd.DataFrame(index=df.index)
+    if score is not None:
+        table["Score"] = key.loc[order].round(2)
+    table["Micole Rating"] = rating.map("{:.1f}".format, na_action="ignore").fillna("—")
+    for label, column in TEXT_COLUMNS.items():
+        table[label] = _text_or_na(df, column)
+
+    policy = _text_or_na(df, "device_policy_summary")
+    long = policy.str.len() > POLICY_PREVIEW_CHARS
+    table["Screen Policy"] = policy.mask(long, policy.str[:POLICY_PREVIEW_CHARS] + "...")
+    table["id"] = df["id"].astype("string")  # hidden in the app; used to highlight rows
+    return table.reset_index(drop=True)
+
+
+def patch_table(table: pd.DataFrame, df: pd.DataFrame, positions, score=None) -> pd.DataFrame:
+    """Copy of a build_table() result with the rows of the schools at `positions`
+    rebuilt from df, where they were edited in place.
+
+    The sort keys must not have changed (the score, or the Micole rating when
+    there is none), so the rows keep their places. `score` covers every row
+    of df, like Ranking.scores.
+    """
+    ids = df["id"].iloc[list(positions)].astype("string")
+    rows = np.flatnonzero(table["id"].isin(ids).to_numpy())
+    if not len(rows):
+        return table
+    positions = [p for p, i in zip(positions, ids) if i in set(table["id"].iloc[rows])]
+    fresh = build_table(df.iloc[positions], score=None if score is None else score[positions])
+    fresh = fresh.set_index("id", drop=False).loc[table["id"].iloc[rows]]
+    patched = table.copy()
+    for column in table.columns:
+        patched.iloc[rows, patched.columns.get_loc(column)] = fresh[column].to_numpy()
+    return patched
+
+
+HIGHLIGHT_STYLE = "background-color: #e3f4e1"
+
+
+def highlight_rows(table: pd.DataFrame, ids) -> "pd.io.formats.style.Styler":
+    """Styler shading the rows whose id is in `ids` (full-text search matches)."""
+    matched = table["id"].isin(ids).to_numpy()
+    styles = pd.DataFrame("", index=table.index, columns=table.columns)
+    styles.loc[matched, :] = HIGHLIGHT_STYLE
+    return table.style.apply(lambda _: styles, axis=None)
@@ -0,0 +1,151 @@
+"""
+text_search.py
+Full-text search over the descriptive school fields, ranked with BM25.
+
+A positional inverted index is built once per dataset version over pedagogy,
+curriculum, device policy, special notes and the special_features/facilities
+lists carried in the compiled snapshot (fields missing from the loaded
+dataset are skipped). Queries are tokenized the same way; every term must
+match, and quoted or hyphenated terms ("IB Diploma", screen-light) must
+appear as consecutive words. When rows are edited in place, patched() removes
+and re-adds only their postings.
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+import re
+import unicodedata
+
+import pandas as pd
+
+SEARCH_FIELDS = [
+    "name",
+    "pedagogy",
+    "curriculum",
+    "device_policy_summary",
+    "special_notes",
+    "special_features",
+    "facilities",
+]
+
+# Position gap between fields so phrases never match across two fields
+FIELD_GAP = 1000
+
+
+def tokenize(text: str) -> list[str]:
+    """Accent-folded, casefolded word tokens."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return re.findall(r"\w+", text)
+
+
+def parse_query(query: str) -> list[tuple[str, ...]]:
+    """Split a query into terms; each term is a tuple of consecutive tokens."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        tokens = tuple(tokenize(phrase or word))
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+
+class SearchIndex:
+    """Positional inverted index with BM25 scoring."""
+
+    def __init__(self, df: pd.DataFrame, fields: list[str] = SEARCH_FIELDS,
+                 k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.fields = fields
+        self.ids = df["id"].astype("string").tolist()
+        self.postings: dict[str, dict[int, list[int]]] = {}
+        self.doc_len = [0] * len(df)
+        self._add(df, range(len(df)))
+        self.avg_len = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+
+    def _add(self, df: pd.DataFrame, docs, own=None) -> None:
+        """Index the rows at positions `docs` (own: tokens whose postings this
+        index may modify; all when None)."""
+        rows = df.iloc[list(docs)] if len(docs) != len(df) else df
+        columns = [rows[f].astype("string").fillna("").tolist() for f in self.fields if f in rows]
+        for doc, values in zip(docs, zip(*columns)):
+            pos = 0
+            for value in values:
+                tokens = tokenize(value)
+                for offset, token in enumerate(tokens):
+                    if own is not None and token not in own:
+                        own.add(token)
+                        self.postings[token] = dict(self.postings.get(token, {}))
+                    self.postings.setdefault(token, {}).setdefault(doc, []).append(pos + offset)
+                self.doc_len[doc] += len(tokens)
+                pos += len(tokens) + FIELD_GAP
+
+    def patched(self, df: pd.DataFrame, positions) -> SearchIndex:
+        """A copy with the postings of the documents at `positions` removed and
+        re-added from df, the frame this index was built from with those rows
+        edited in place. Postings of other tokens are shared with this index."""
+        docs = set(positions)
+        patched = copy.copy(self)
+        patched.postings = dict(self.postings)
+        patched.doc_len = list(self.doc_len)
+        own = set()
+        for token, postings in self.postings.items():
+            if any(doc in postings for doc in docs):
+                kept = {doc: p for doc, p in postings.items() if doc not in docs}
+                if kept:
+                    patched.postings[token] = kept
+                    own.add(token)
+                else:
+                    del patched.postings[token]
+        for doc in docs:
+            patched.doc_len[doc] = 0
+        patched._add(df, sorted(docs), own)
+        patched.avg_len = (sum(patched.doc_len) / len(patched.doc_len)) if patched.doc_len else 0.0
+        return patched
+
+    def _term_frequencies(self, term: tuple[str, ...]) -> dict[int, int]:
+        """doc -> number of occurrences of a word or phrase."""
+        first = self.postings.get(term[0], {})
+        if len(term) == 1:
+            return {doc: len(positions) for doc, positions in first.items()}
+        rest = [self.postings.get(t, {}) for t in term[1:]]
+        tf = {}
+        for doc, positions in first.items():
+            if not all(doc in p for p in rest):
+                continue
+            following = [set(p[doc]) for p in rest]
+            hits = sum(
+                all(start + i + 1 in following[i] for i in range(len(following)))
+                for start in positions
+            )
+            if hits:
+                tf[doc] = hits
+        return tf
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[str, float]]:
+        """Ranked (school_id, score) pairs for documents matching every term."""
+        terms = parse_query(query)
+        if not terms or not self.ids:
+            return []
+        n_docs = len(self.ids)
+        scores: dict[int, float] | None = None
+        for term in terms:
+            tf = self._term_frequencies(term)
+            if not tf:
+                return []
+            idf = math.log(1 + (n_docs - len(tf) + 0.5) / (len(tf) + 0.5))
+            term_scores = {}
+            for doc, freq in tf.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc] / self.avg_len)
+                term_scores[doc] = idf * freq * (self.k1 + 1) / (freq + norm)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc: s + term_scores[doc] for doc, s in scores.items() if doc in term_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.ids[doc], score) for doc, score in ranked]
@@ -0,0 +1,300 @@
+"""
+travel_time.py
+Offline travel times and isochrones over a local road graph.
+
+Straight-line distance flatters the suburban schools (Puçol, Paterna,
+Godella): the roads out there are few and fast, the ones in town many and
+slow. This module answers "how long from home to each school" on the road
+network instead, without any network access at runtime:
+
+- build: an OpenStreetMap extract in .osm XML (e.g. exported from
+  openstreetmap.org, Overpass or `osmium cat valencia.osm.pbf -o valencia.osm`)
+  is reduced once to a compact graph file, road_graph.npz: node coordinates
+  and a CSR adjacency with per-edge length, road class and speed limit
+- query: one bounded Dijkstra from the home point's nearest road node yields
+  the time to every node, so the times to all schools come out of a single
+  search (the app caches it per home point and profile)
+- isochrones: the nodes reached within each time band are rasterized onto a
+  small grid and returned as GeoJSON (multi)polygons for the map
+
+Profiles:
+- "drive": the edge's maxspeed when tagged, else a default per road class
+- "transit": a rough public-transport approximation, a flat bus-like speed on
+  urban roads, faster interurban links, walking on paths, plus a fixed
+  waiting/access time; good for ranking schools, not for timetables
+
+Usage:
+    python travel_time.py valencia.osm [--output road_graph.npz]
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from proximity import BallTree, haversine_km
+
+ROAD_GRAPH_FILE = "road_graph.npz"
+
+# OSM highway classes kept in the graph; *_link roads use their base class
+ROAD_CLASSES = [
+    "motorway", "trunk", "primary", "secondary", "tertiary",
+    "unclassified", "residential", "living_street", "service",
+]
+
+# Speeds in km/h per road class, in ROAD_CLASSES order
+PROFILE_SPEEDS = {
+    "drive": [100, 80, 50, 45, 40, 30, 30, 10, 15],
+    "transit": [45, 35, 18, 18, 18, 15, 15, 5, 5],
+}
+
+# Minutes added to every transit trip (walk to the stop, waiting)
+PROFILE_OFFSET_MIN = {"drive": 0.0, "transit": 8.0}
+
+PROFILE_LABELS = {"drive": "Car", "transit": "Public transport (approx.)"}
+
+ISOCHRONE_MINUTES = (10, 20, 30)
+
+# Search cutoff; schools farther than this are reported as unreachable
+MAX_MINUTES = 90.0
+
+# Home and schools are snapped to the nearest road node within this distance
+SNAP_RADIUS_KM = 1.0
+
+# Isochrone raster cell, about 500 m
+ISOCHRONE_CELL_DEG = 0.005
+
+ONEWAY_FORWARD = {"yes", "true", "1"}
+ONEWAY_REVERSE = {"-1", "reverse"}
+
+
+def graph_version(path: str = ROAD_GRAPH_FILE) -> str | None:
+    """Version stamp (mtime and size) of a graph file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _road_class(highway: str | None) -> int | None:
+    if not highway:
+        return None
+    base = highway[:-5] if highway.endswith("_link") else highway
+    return ROAD_CLASSES.index(base) if base in ROAD_CLASSES else None
+
+
+def _maxspeed(text: str | None) -> float:
+    m = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", text or "")
+    if not m:
+        return math.nan
+    return float(m.group(1)) * (1.609344 if m.group(2) else 1.0)
+
+
+def build_graph(osm_path: str) -> dict[str, np.ndarray]:
+    """Road graph arrays from an .osm XML extract."""
+    node_coords: dict[str, tuple[float, float]] = {}
+    ways = []  # (node refs, road class, maxspeed, oneway)
+    for _, elem in ET.iterparse(osm_path, events=("end",)):
+        if elem.tag == "node":
+            node_coords[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            road_class = _road_class(tags.get("highway"))
+            if road_class is not None:
+                oneway = tags.get("oneway", "")
+                if oneway in ONEWAY_FORWARD or (not oneway and tags.get("highway") == "motorway"):
+                    direction = 1
+                elif oneway in ONEWAY_REVERSE:
+                    direction = -1
+                else:
+                    direction = 0
+                refs = [nd.get("ref") for nd in elem.iter("nd")]
+                ways.append((refs, road_class, _maxspeed(tags.get("maxspeed")), direction))
+            elem.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+
+    index: dict[str, int] = {}
+    src, dst, road_class, maxspeed = [], [], [], []
+    for refs, cls, speed, direction in ways:
+        refs = [r for r in refs if r in node_coords]
+        for a, b in zip(refs, refs[1:]):
+            ia = index.setdefault(a, len(index))
+            ib = index.setdefault(b, len(index))
+            pairs = {1: [(ia, ib)], -1: [(ib, ia)], 0: [(ia, ib), (ib, ia)]}[direction]
+            for u, v in pairs:
+                src.append(u)
+                dst.append(v)
+                road_class.append(cls)
+                maxspeed.append(speed)
+
+    coords = np.array([node_coords[n] for n in index], dtype="float64").reshape(-1, 2)
+    src = np.asarray(src, dtype="int64")
+    dst = np.asarray(dst, dtype="int64")
+    length_m = 1000 * haversine_km(coords[src, 0], coords[src, 1], coords[dst, 0], coords[dst, 1])
+
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(len(coords) + 1, dtype="int64")
+    np.cumsum(np.bincount(src, minlength=len(coords)), out=indptr[1:])
+    return {
+        "lat": coords[:, 0],
+        "lon": coords[:, 1],
+        "indptr": indptr,
+        "indices": dst[order].astype("int32"),
+        "length_m": length_m[order].astype("float32"),
+        "road_class": np.asarray(road_class, dtype="uint8")[order],
+        "maxspeed_kmh": np.asarray(maxspeed, dtype="float32")[order],
+    }
+
+
+class RoadGraph:
+    """Road network in CSR form with per-profile edge times."""
+
+    def __init__(self, arrays: dict[str, np.ndarray], version: str | None = None):
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.length_m = arrays["length_m"]
+        self.road_class = arrays["road_class"]
+        self.maxspeed_kmh = arrays["maxspeed_kmh"]
+        self.version = version
+        self.tree = BallTree(self.lat, self.lon) if len(self.lat) else None
+        self._edge_minutes: dict[str, np.ndarray] = {}
+        self._lists: dict[str, tuple[list, list, list]] = {}
+
+    @classmethod
+    def load(cls, path: str = ROAD_GRAPH_FILE) -> RoadGraph | None:
+        """The graph in path, or None when no road graph has been built."""
+        version = graph_version(path)
+        if version is None:
+            return None
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files}, version)
+
+    def save(self, path: str = ROAD_GRAPH_FILE) -> None:
+        np.savez_compressed(
+            path, lat=self.lat, lon=self.lon, indptr=self.indptr, indices=self.indices,
+            length_m=self.length_m, road_class=self.road_class, maxspeed_kmh=self.maxspeed_kmh,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lat)
+
+    def edge_minutes(self, profile: str) -> np.ndarray:
+        """Traversal time of every edge in minutes for a profile."""
+        if profile not in self._edge_minutes:
+            speed = np.asarray(PROFILE_SPEEDS[profile], dtype="float32")[self.road_class]
+            if profile == "drive":
+                speed = np.where(np.isnan(self.maxspeed_kmh), speed, self.maxspeed_kmh)
+            self._edge_minutes[profile] = self.length_m / (np.maximum(speed, 1.0) * 1000 / 60)
+        return self._edge_minutes[profile]
+
+    def snap(self, lats, lons) -> np.ndarray:
+        """Nearest road node of each point within SNAP_RADIUS_KM (-1 if none)."""
+        lats = np.atleast_1d(np.asarray(lats, dtype="float64"))
+        lons = np.atleast_1d(np.asarray(lons, dtype="float64"))
+        nodes = np.full(len(lats), -1, dtype="int64")
+        if self.tree is None:
+            return nodes
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            cand = self.tree.candidates(lat, lon, SNAP_RADIUS_KM)
+            if len(cand):
+                dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+                if dist.min() <= SNAP_RADIUS_KM:
+                    nodes[i] = cand[np.argmin(dist)]
+        return nodes
+
+    def travel_minutes(self, source: int, profile: str = "drive",
+                       max_minutes: float = MAX_MINUTES) -> np.ndarray:
+        """Minutes from a source node to every node (inf beyond max_minutes).
+
+        One Dijkstra search bounded by max_minutes; the profile's fixed
+        offset (transit waiting time) is added to every finite time.
+        """
+        offset = PROFILE_OFFSET_MIN[profile]
+        if source < 0:
+            return np.full(self.node_count, np.inf)
+        indptr, indices, weights = self._adjacency(profile)
+        limit = max_minutes - offset
+        dist = [math.inf] * self.node_count
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in range(indptr[u], indptr[u + 1]):
+                nd = d + weights[e]
+                v = indices[e]
+                if nd < dist[v] and nd <= limit:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return np.asarray(dist) + offset
+
+    def _adjacency(self, profile: str) -> tuple[list, list, list]:
+        # Plain lists: indexing them in the search loop is much faster than
+        # indexing NumPy arrays element by element
+        if profile not in self._lists:
+            self._lists[profile] = (
+                self.indptr.tolist(), self.indices.tolist(), self.edge_minutes(profile).tolist()
+            )
+        return self._lists[profile]
+
+    def isochrones(self, minutes: np.ndarray, bands=ISOCHRONE_MINUTES,
+                   cell_deg: float = ISOCHRONE_CELL_DEG) -> dict:
+        """GeoJSON FeatureCollection with one MultiPolygon per time band.
+
+        The nodes reached within a band are binned into cell_deg grid cells;
+        each row's runs of adjacent cells become one rectangle. Features are
+        ordered largest band first so smaller bands draw on top.
+        """
+        features = []
+        for band, limit in sorted(enumerate(bands), key=lambda b: -b[1]):
+            reached = minutes <= limit
+            if not reached.any():
+                continue
+            rows = np.floor(self.lat[reached] / cell_deg).astype("int64")
+            cols = np.floor(self.lon[reached] / cell_deg).astype("int64")
+            cells = np.unique(np.column_stack((rows, cols)), axis=0)  # sorted by row, col
+            breaks = np.flatnonzero((np.diff(cells[:, 0]) != 0) | (np.diff(cells[:, 1]) != 1)) + 1
+            starts = np.concatenate(([0], breaks))
+            ends = np.concatenate((breaks, [len(cells)])) - 1
+            polygons = []
+            for start, end in zip(starts, ends):
+                south = round(float(cells[start, 0] * cell_deg), 5)
+                north = round(float((cells[start, 0] + 1) * cell_deg), 5)
+                west = round(float(cells[start, 1] * cell_deg), 5)
+                east = round(float((cells[end, 1] + 1) * cell_deg), 5)
+                polygons.append([[[west, south], [east, south], [east, north], [west, north], [west, south]]])
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+                "properties": {"band": band, "minutes": limit},
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline road graph from an OSM extract.")
+    parser.add_argument("osm", help="OpenStreetMap extract in .osm XML format")
+    parser.add_argument("--output", default=ROAD_GRAPH_FILE)
+    args = parser.parse_args()
+
+    graph = RoadGraph(build_graph(args.osm))
+    graph.save(args.output)
+    print(f"Wrote {graph.node_count} nodes and {len(graph.indices)} edges to {args.output}")
+
+
+if __name__ == "__main__":
+    main()